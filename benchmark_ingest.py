@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Ingestion Benchmark
+Run the PDF ingestion pipeline (load_pdf + create_vectorstore) against a
+synthetic corpus and report throughput, peak memory and index size.
+Uses a deterministic local embedding so results don't depend on Ollama.
+"""
+
+from langchain_core.embeddings import Embeddings
+from create_test_pdf import generate_corpus
+from page_cache import PageCache
+from pdf_analyzer import load_pdf, create_vectorstore
+import pdf_analyzer
+import numpy as np
+import faiss
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import re
+import resource
+import sys
+import tempfile
+import time
+
+_TOKEN = re.compile(r"\w+")
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words embedding using the hashing trick.
+
+    Stands in for OllamaEmbeddings in benchmarks: same text, same vector,
+    no server, and similar texts still land close together.
+    """
+
+    def __init__(self, size=384):
+        self.size = size
+
+    def _embed(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in _TOKEN.findall(text.lower()):
+            h = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[h % self.size] += 1.0 if (h >> 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_benchmark(corpus_dir, verbose=False, page_cache=None):
+    """Ingest every PDF in corpus_dir and return the measured results.
+
+    Page text is extracted into a fresh, throwaway cache unless page_cache
+    names one to reuse, so by default every run measures cold extraction.
+    """
+    scratch = None
+    if page_cache is None:
+        scratch = tempfile.TemporaryDirectory()
+        page_cache = os.path.join(scratch.name, "pages.sqlite")
+    pdf_analyzer.page_cache = PageCache(page_cache)
+    pdf_paths = sorted(os.path.join(corpus_dir, f) for f in os.listdir(corpus_dir) if f.endswith(".pdf"))
+    quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+
+    with quiet:
+        start = time.perf_counter()
+        documents = []
+        for pdf_path in pdf_paths:
+            documents.extend(load_pdf(pdf_path))
+        load_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        vectorstore = create_vectorstore(documents, embedding=HashEmbeddings())
+        index_seconds = time.perf_counter() - start
+
+    if scratch is not None:
+        scratch.cleanup()
+    chunks = vectorstore.index.ntotal
+    return {
+        "pdfs": len(pdf_paths),
+        "pages": len(documents),
+        "chunks": chunks,
+        "load_seconds": round(load_seconds, 3),
+        "index_seconds": round(index_seconds, 3),
+        "pages_per_sec": round(len(documents) / load_seconds, 1) if load_seconds else None,
+        "chunks_per_sec": round(chunks / index_seconds, 1) if index_seconds else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "index_bytes": int(faiss.serialize_index(vectorstore.index).nbytes),
+    }
+
+
+def main():
+    """Generate (if needed) a corpus and benchmark ingestion against it."""
+    parser = argparse.ArgumentParser(description="Benchmark PDF ingestion on a synthetic corpus.")
+    parser.add_argument("--corpus", default="bench_corpus", help="corpus directory (generated if missing)")
+    parser.add_argument("--docs", type=int, default=100, help="number of PDFs to generate")
+    parser.add_argument("--min-pages", type=int, default=5, help="minimum pages per generated PDF")
+    parser.add_argument("--max-pages", type=int, default=20, help="maximum pages per generated PDF")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the generated corpus")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline output")
+    parser.add_argument("--page-cache", metavar="PATH", help="reuse this page text cache (default: a fresh one per run)")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.corpus):
+        print(f"📝 Generating {args.docs} PDFs in {args.corpus} (seed {args.seed})...")
+        generate_corpus(args.corpus, args.docs, args.min_pages, args.max_pages, args.seed)
+
+    print(f"⏱️  Benchmarking ingestion of {args.corpus}...")
+    results = run_benchmark(args.corpus, verbose=args.verbose, page_cache=args.page_cache)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("\n📊 Ingestion Benchmark Results")
+    print("=" * 50)
+    print(f"PDFs:          {results['pdfs']}")
+    print(f"Pages:         {results['pages']} ({results['pages_per_sec']} pages/sec)")
+    print(f"Chunks:        {results['chunks']} ({results['chunks_per_sec']} chunks/sec)")
+    print(f"Peak RSS:      {results['peak_rss_mb']} MB")
+    print(f"Index size:    {results['index_bytes'] / (1024 * 1024):.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,24 @@
 #!/usr/bin/env python3
 """
 Create a test PDF file for testing the PDF analyzer.
+Can also generate large seeded corpora for ingestion benchmarks.
 """
 
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.units import inch
+import argparse
+import os
+import random
+
+TOPICS = ["machine learning", "neural networks", "transformer models", "data pipelines",
+          "vector search", "text classification", "model evaluation", "feature engineering"]
+WORDS = ("accuracy attention baseline benchmark corpus dataset embedding encoder gradient "
+         "inference latency layer loss metric optimizer parameter precision recall retrieval "
+         "sample sequence signal throughput token training validation variance vocabulary weight").split()
+BOILERPLATE_HEADER = "ACME Research Group - Internal Technical Report - Confidential"
+BOILERPLATE_FOOTER = ("This document contains proprietary information. Redistribution without "
+                      "written permission is prohibited. Page {page} of {pages}.")
 
 def create_test_pdf():
     """Create a simple test PDF with sample content."""
@@ -134,5 +147,88 @@ def create_test_pdf():
     c.save()
     print("✅ Created test_document.pdf successfully!")
 
+def _sentence(rng):
+    """Build one pseudo-random sentence about a topic."""
+    words = rng.sample(WORDS, rng.randint(6, 12))
+    return f"The {rng.choice(TOPICS)} study reports {' '.join(words)} at {rng.randint(1, 99)}.{rng.randint(0, 9)}%."
+
+def _draw_page(c, rng, page, pages):
+    """Draw one corpus page: boilerplate, paragraphs and a results table."""
+    width, height = letter
+    c.setFont("Helvetica", 8)
+    c.drawString(1*inch, height-0.5*inch, BOILERPLATE_HEADER)
+    c.drawString(1*inch, 0.5*inch, BOILERPLATE_FOOTER.format(page=page, pages=pages))
+    
+    title = f"Section {page}: {rng.choice(TOPICS).title()}"
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(1*inch, height-1*inch, title)
+    # Bookmarks: the first half of the pages is Part I, the rest Part II
+    if page in (1, pages // 2 + 1):
+        c.bookmarkPage(f"part{page}")
+        c.addOutlineEntry("Part I" if page == 1 else "Part II", f"part{page}", level=0)
+    c.bookmarkPage(f"p{page}")
+    c.addOutlineEntry(title, f"p{page}", level=1)
+    
+    y_position = height-1.4*inch
+    c.setFont("Helvetica", 10)
+    for _ in range(rng.randint(2, 4)):
+        text = " ".join(_sentence(rng) for _ in range(rng.randint(3, 6)))
+        line = ""
+        for word in text.split():
+            if len(line) + len(word) > 95:
+                c.drawString(1*inch, y_position, line)
+                y_position -= 0.2*inch
+                line = ""
+            line = f"{line} {word}".strip()
+        c.drawString(1*inch, y_position, line)
+        y_position -= 0.4*inch
+    
+    if rng.random() < 0.5:
+        c.setFont("Helvetica-Bold", 10)
+        c.drawString(1*inch, y_position, "Model        Accuracy    F1-score    Latency (ms)")
+        c.setFont("Helvetica", 10)
+        for _ in range(rng.randint(3, 6)):
+            y_position -= 0.2*inch
+            row = (f"{rng.choice(['BERT', 'GPT', 'RNN', 'CNN', 'T5']):<13}"
+                   f"{rng.uniform(70, 99):<12.1f}{rng.uniform(0.7, 0.99):<12.3f}{rng.randint(5, 500)}")
+            c.drawString(1*inch, y_position, row)
+    c.showPage()
+
+def generate_corpus(out_dir, num_docs=100, min_pages=5, max_pages=20, seed=0):
+    """Generate a seeded corpus of PDFs and return their paths.
+    
+    Pages mix prose, results tables and a header/footer repeated on every
+    page, so the same seed always yields byte-for-byte comparable inputs.
+    The outline splits each PDF into two parts with one section per page.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = random.Random(seed)
+    paths = []
+    for doc in range(num_docs):
+        path = os.path.join(out_dir, f"doc_{doc:05d}.pdf")
+        pages = rng.randint(min_pages, max_pages)
+        c = canvas.Canvas(path, pagesize=letter, invariant=1)
+        for page in range(1, pages + 1):
+            _draw_page(c, rng, page, pages)
+        c.save()
+        paths.append(path)
+    return paths
+
+def main():
+    """Create the sample PDF, or a synthetic corpus with --corpus."""
+    parser = argparse.ArgumentParser(description="Create test PDFs for the PDF analyzer.")
+    parser.add_argument("--corpus", metavar="DIR", help="generate a synthetic corpus in DIR instead")
+    parser.add_argument("--docs", type=int, default=100, help="number of PDFs in the corpus")
+    parser.add_argument("--min-pages", type=int, default=5, help="minimum pages per PDF")
+    parser.add_argument("--max-pages", type=int, default=20, help="maximum pages per PDF")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+    
+    if args.corpus:
+        paths = generate_corpus(args.corpus, args.docs, args.min_pages, args.max_pages, args.seed)
+        print(f"✅ Created {len(paths)} PDFs in {args.corpus}")
+    else:
+        create_test_pdf()
+
 if __name__ == "__main__":
-    create_test_pdf() 
\ No newline at end of file
+    main() 
\ No newline at end of file
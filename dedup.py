@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Near-Duplicate Chunk Detection
+Collapse repeated boilerplate (headers, footers, disclaimers) into a single
+chunk before anything is embedded. Header and footer lines repeated across
+a file's pages are stripped from each page and kept once; near-identical
+chunks are then merged using MinHash signatures and LSH banding.
+"""
+
+from collections import Counter
+from langchain_core.documents import Document
+import hashlib
+import math
+import re
+
+import numpy as np
+
+# 128 permutations split into 16 bands of 8 rows puts the LSH S-curve knee
+# around a Jaccard similarity of ~0.7; candidates are then checked exactly
+# against the configured threshold.
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, 2**31, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, 2**31, size=NUM_PERM).astype(np.uint64)
+
+_SPACE = re.compile(r"\s+")
+_DIGITS = re.compile(r"\d+")
+
+# Lines this close to the top or bottom of a page's text may be a header or
+# footer; one counts as such when it recurs on enough of the file's pages
+EDGE_LINES = 3
+MIN_REPEATS = 3
+
+
+def _shingles(text):
+    """Return the set of hashed word shingles for a chunk of text."""
+    # Numbers are kept as they are: two tables that differ only in their
+    # figures are different content, not copies of each other.
+    normalized = _SPACE.sub(" ", text.lower()).strip()
+    words = normalized.split(" ")
+    if len(words) < SHINGLE_SIZE:
+        grams = [normalized]
+    else:
+        grams = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    return {
+        int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little")
+        for g in grams
+    }
+
+
+def _line_key(line):
+    """Normalize a header/footer candidate so page numbers and dates match."""
+    return _DIGITS.sub("0", _SPACE.sub(" ", line.lower())).strip()
+
+
+def _edge_lines(lines):
+    """Indexes of the lines that could be part of a header or footer."""
+    return set(range(min(EDGE_LINES, len(lines)))) | set(range(max(0, len(lines) - EDGE_LINES), len(lines)))
+
+
+def strip_repeated_lines(pages, min_share=0.5):
+    """Remove header and footer lines that repeat across a file's pages.
+
+    A line near the top or bottom of a page is boilerplate when, with its
+    digits ignored, it appears in that position on at least min_share of
+    the file's pages. Those lines are removed from every page and returned
+    once per file as an extra document listing every page they were on.
+    Digits are only ignored inside these candidate lines, never in content.
+    """
+    by_source = {}
+    for page in pages:
+        by_source.setdefault(page.metadata.get("source"), []).append(page)
+
+    result = []
+    for group in by_source.values():
+        page_lines = [page.page_content.splitlines() for page in group]
+        counts = Counter()
+        for lines in page_lines:
+            counts.update({_line_key(lines[i]) for i in _edge_lines(lines) if lines[i].strip()})
+        needed = max(MIN_REPEATS, math.ceil(min_share * len(group)))
+        repeated = {key for key, count in counts.items() if count >= needed}
+        if not repeated:
+            result.extend(group)
+            continue
+
+        boilerplate, stripped_pages, stripped = {}, [], []
+        for page, lines in zip(group, page_lines):
+            edges = _edge_lines(lines)
+            keep = []
+            for i, line in enumerate(lines):
+                key = _line_key(line)
+                if i in edges and key in repeated:
+                    boilerplate.setdefault(key, line.strip())
+                else:
+                    keep.append(line)
+            if len(keep) < len(lines) and "page" in page.metadata:
+                stripped_pages.append(page.metadata["page"])
+            stripped.append(Document(page_content="\n".join(keep), metadata=dict(page.metadata)))
+
+        metadata = dict(group[0].metadata, pages=sorted(stripped_pages),
+                        duplicates=max(0, len(stripped_pages) - 1))
+        if stripped_pages:
+            metadata["page"] = min(stripped_pages)
+        # Spans the whole file, not the first page's outline section
+        metadata.pop("section", None)
+        result.append(Document(page_content="\n".join(boilerplate.values()), metadata=metadata))
+        result.extend(stripped)
+    return result
+
+
+def minhash(text):
+    """Compute the MinHash signature of a chunk of text."""
+    hashes = np.fromiter(_shingles(text), dtype=np.uint64)
+    if hashes.size == 0:
+        return np.full(NUM_PERM, _PRIME, dtype=np.uint64)
+    permuted = (np.outer(hashes, _A) + _B) % _PRIME
+    return permuted.min(axis=0)
+
+
+def similarity(sig_a, sig_b):
+    """Estimate the Jaccard similarity of two MinHash signatures."""
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """LSH index that maps each chunk to the first near-identical chunk seen."""
+
+    def __init__(self, threshold=0.85):
+        self.threshold = threshold
+        self._buckets = [{} for _ in range(BANDS)]
+        self._signatures = []
+
+    def add(self, text):
+        """Add a chunk and return the id of its representative chunk."""
+        sig = minhash(text)
+        keys = [sig[b * ROWS:(b + 1) * ROWS].tobytes() for b in range(BANDS)]
+
+        candidates = set()
+        for band, key in zip(self._buckets, keys):
+            candidates.update(band.get(key, ()))
+        for cand in sorted(candidates):
+            if similarity(sig, self._signatures[cand]) >= self.threshold:
+                return cand
+
+        new_id = len(self._signatures)
+        self._signatures.append(sig)
+        for band, key in zip(self._buckets, keys):
+            band.setdefault(key, []).append(new_id)
+        return new_id
+
+
+def collapse_near_duplicates(docs, threshold=0.85):
+    """Collapse near-identical chunks of the same file into one.
+
+    Chunks are only compared with chunks from the same ``source``, so the
+    kept chunk's source and page numbers always belong together. The first
+    chunk of each duplicate group is kept and its metadata gains a sorted
+    ``pages`` list covering all members and a ``duplicates`` count.
+    """
+    indexes = {}
+    kept = []
+    groups = {}
+    for doc in docs:
+        source = doc.metadata.get("source")
+        index, reps = indexes.setdefault(source, (NearDuplicateIndex(threshold), []))
+        rep = index.add(doc.page_content)
+        if rep == len(reps):
+            reps.append(len(kept))
+            groups[len(kept)] = [doc]
+            kept.append(doc)
+        else:
+            groups[reps[rep]].append(doc)
+
+    for position, members in groups.items():
+        pages = set()
+        for member in members:
+            pages.update(member.metadata.get("pages") or
+                         ([member.metadata["page"]] if "page" in member.metadata else []))
+        # Members may already stand for several pages (e.g. stripped boilerplate)
+        duplicates = len(members) - 1 + sum(m.metadata.get("duplicates", 0) for m in members)
+        kept[position].metadata["pages"] = sorted(pages)
+        kept[position].metadata["duplicates"] = duplicates
+    return kept
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Batched Embeddings
+OllamaBatchEmbeddings sends many texts per request to Ollama's /api/embed
+endpoint. MicroBatchingEmbeddings coalesces query embeddings that arrive
+within a few milliseconds of each other (concurrent Chainlit sessions, say)
+into one such request and fans the vectors back out to the callers.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from langchain_core.embeddings import Embeddings
+import requests
+import threading
+import time
+
+
+class OllamaBatchEmbeddings(Embeddings):
+    """Ollama embeddings that send a whole batch of texts per HTTP request.
+
+    Uses the same "passage: " / "query: " instructions as langchain's
+    OllamaEmbeddings. Note /api/embed returns unit-length vectors, so an
+    index and its queries should both be embedded through this class.
+    """
+
+    def __init__(self, model="nomic-embed-text", base_url="http://localhost:11434",
+                 embed_instruction="passage: ", query_instruction="query: ",
+                 request_size=64, timeout=60):
+        self.model = model
+        self.base_url = base_url
+        self.embed_instruction = embed_instruction
+        self.query_instruction = query_instruction
+        self.request_size = request_size
+        self.timeout = timeout
+
+    def _embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.request_size):
+            response = requests.post(
+                f"{self.base_url}/api/embed",
+                json={"model": self.model, "input": texts[start:start + self.request_size]},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            vectors.extend(response.json()["embeddings"])
+        return vectors
+
+    def embed_documents(self, texts):
+        return self._embed([f"{self.embed_instruction}{text}" for text in texts])
+
+    def embed_queries(self, texts):
+        """Embed several queries in one request."""
+        return self._embed([f"{self.query_instruction}{text}" for text in texts])
+
+    def embed_query(self, text):
+        return self.embed_queries([text])[0]
+
+
+class MicroBatchingEmbeddings(Embeddings):
+    """Coalesce concurrent embed_query calls into batched requests.
+
+    A flusher thread waits until max_batch queries are queued or the oldest
+    has waited max_wait_ms, then hands the batch to the inner embeddings'
+    embed_queries (falling back to one embed_query per text). Up to
+    max_inflight batches run at once. Documents pass straight through.
+    """
+
+    def __init__(self, inner, max_batch=16, max_wait_ms=5.0, max_inflight=2):
+        self.inner = inner
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.queries = 0
+        self.batches = 0
+        self._pending = []
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="embed-batch")
+        threading.Thread(target=self._flush_loop, name="embed-flusher", daemon=True).start()
+
+    def embed_documents(self, texts):
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        future = Future()
+        with self._cond:
+            self._pending.append((time.monotonic(), text, future))
+            self._cond.notify()
+        return future.result()
+
+    def stats(self):
+        """Queries embedded, batches sent and the mean batch size."""
+        with self._cond:
+            mean = self.queries / self.batches if self.batches else 0.0
+            return {"queries": self.queries, "batches": self.batches, "mean_batch_size": round(mean, 2)}
+
+    def _flush_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                flush_at = self._pending[0][0] + self.max_wait
+                while len(self._pending) < self.max_batch:
+                    remaining = flush_at - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._pending[:self.max_batch]
+                del self._pending[:self.max_batch]
+                self.queries += len(batch)
+                self.batches += 1
+            self._executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        texts = [text for _, text, _ in batch]
+        try:
+            if hasattr(self.inner, "embed_queries"):
+                vectors = self.inner.embed_queries(texts)
+            else:
+                vectors = [self.inner.embed_query(text) for text in texts]
+            if len(vectors) != len(batch):
+                raise ValueError(f"Embedding batch of {len(batch)} queries returned {len(vectors)} vectors")
+        except Exception as e:
+            # Fail every caller: with a short reply we can't tell whose vector is missing
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        for (_, _, future), vector in zip(batch, vectors):
+            future.set_result(vector)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Stand-in Ollama Server
+A small HTTP server that answers the parts of the Ollama API this project
+uses, so setup.py, the hedger and the embedding batcher can be exercised
+without downloading any models.
+
+  /api/version, /api/tags   report the installed models and their digests
+  /api/pull                 streams progress; can drop the connection half way
+  /api/generate             streams a canned answer after a per-model delay
+  /api/embed                returns deterministic vectors
+
+Usage:
+  python fake_ollama.py --port 11500
+  OLLAMA_HOST=127.0.0.1:11500 python setup.py --skip-deps
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import hashlib
+import json
+import threading
+import time
+
+
+class FakeOllama:
+    """Server state plus the knobs tests turn.
+
+    models           name -> digest of the installed models
+    pull_digests     digest a pulled model ends up with (default: derived from its name)
+    interrupt_pulls  names whose first pull drops the connection half way
+    delays           seconds before the first token, per model
+    """
+
+    PULL_TOTAL = 1000
+    PULL_STEP = 100
+
+    def __init__(self, port=0, models=None):
+        self.models = dict(models or {})
+        self.pull_digests = {}
+        self.interrupt_pulls = set()
+        self.delays = {}
+        self.pulls = []
+        self.generations = []
+        self.embed_requests = []
+        self._progress = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self.server.daemon_threads = True
+        self.host = f"127.0.0.1:{self.server.server_address[1]}"
+        self.url = f"http://{self.host}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _start_stream(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+            def _send_event(self, event):
+                data = json.dumps(event).encode("utf-8") + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def _end_stream(self):
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/api/version":
+                    self._send_json({"version": "0.0.0-fake"})
+                elif self.path == "/api/tags":
+                    with fake._lock:
+                        models = [{"name": name, "digest": digest} for name, digest in fake.models.items()]
+                    self._send_json({"models": models})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                handler = {"/api/pull": self._pull, "/api/generate": self._generate,
+                           "/api/embed": self._embed}.get(self.path)
+                if handler is None:
+                    self.send_error(404)
+                    return
+                handler(request)
+
+            def _pull(self, request):
+                name = request.get("name") or request["model"]
+                with fake._lock:
+                    done = fake._progress.get(name, 0)
+                    fake.pulls.append((name, done))
+                    interrupt = name in fake.interrupt_pulls
+                    fake.interrupt_pulls.discard(name)
+                self._start_stream()
+                self._send_event({"status": "pulling manifest"})
+                while done < fake.PULL_TOTAL:
+                    done += fake.PULL_STEP
+                    with fake._lock:
+                        fake._progress[name] = done
+                    self._send_event({"status": f"pulling {name}", "total": fake.PULL_TOTAL, "completed": done})
+                    if interrupt and done >= fake.PULL_TOTAL // 2:
+                        # Drop the connection mid-download, like a network failure
+                        self.close_connection = True
+                        return
+                with fake._lock:
+                    digest = fake.pull_digests.get(name) or hashlib.sha256(name.encode()).hexdigest()
+                    fake.models[name if ":" in name else name + ":latest"] = digest
+                    fake._progress.pop(name, None)
+                self._send_event({"status": "success"})
+                self._end_stream()
+
+            def _generate(self, request):
+                model = request["model"]
+                # Like Ollama, send nothing (not even headers) until the first token
+                time.sleep(fake.delays.get(model, 0.0))
+                try:
+                    self._start_stream()
+                    for word in ["Hello", " from", f" {model}."]:
+                        self._send_event({"model": model, "response": word, "done": False})
+                        time.sleep(0.01)
+                    self._send_event({"model": model, "response": "", "done": True})
+                    self._end_stream()
+                    outcome = "finished"
+                except OSError:
+                    outcome = "client gone"
+                with fake._lock:
+                    fake.generations.append((model, outcome))
+
+            def _embed(self, request):
+                texts = request["input"]
+                texts = [texts] if isinstance(texts, str) else texts
+                with fake._lock:
+                    fake.embed_requests.append(len(texts))
+                self._send_json({"model": request["model"], "embeddings": [fake_vector(t) for t in texts]})
+
+        return Handler
+
+
+def fake_vector(text, size=8):
+    """Deterministic vector for a text."""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    return [b / 255.0 for b in digest[:size]]
+
+
+def main():
+    """Run a stand-in server until interrupted."""
+    parser = argparse.ArgumentParser(description="Run a stand-in Ollama server for tests.")
+    parser.add_argument("--port", type=int, default=11500, help="port to listen on")
+    parser.add_argument("--models", nargs="*", default=[], help="models reported as already installed")
+    args = parser.parse_args()
+
+    fake = FakeOllama(args.port, {name: hashlib.sha256(name.encode()).hexdigest() for name in args.models})
+    print(f"🧪 Stand-in Ollama server on {fake.url} (OLLAMA_HOST={fake.host})")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Deadline-Bounded and Hedged LLM Requests
+Give every generation a hard deadline, and optionally hedge: if the first
+token hasn't arrived within the recent p95 first-token latency, send the
+same request to a backup (another Ollama server or a smaller model), keep
+whichever starts answering first and cancel the other.
+"""
+
+import queue
+import threading
+import time
+from collections import Counter, deque
+import profiling
+
+
+class DeadlineExceeded(Exception):
+    """Raised when no complete answer arrived before the deadline."""
+
+
+class Cancel(threading.Event):
+    """An event that also runs callbacks when set.
+
+    Attempts blocked on I/O never get to check is_set(); they can register
+    a callback that interrupts the I/O instead (e.g. closes the connection).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks = []
+        self._callbacks_lock = threading.Lock()
+
+    def on_set(self, callback):
+        """Run callback once the event is set (right away if it already is).
+
+        Returns a function that unregisters the callback.
+        """
+        with self._callbacks_lock:
+            if not self.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove(callback)
+        callback()
+        return lambda: None
+
+    def _remove(self, callback):
+        with self._callbacks_lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def set(self):
+        # Callbacks run under the lock, so once the function returned by
+        # on_set() comes back, the callback can no longer fire
+        with self._callbacks_lock:
+            super().set()
+            callbacks, self._callbacks = self._callbacks, []
+            for callback in callbacks:
+                callback()
+
+
+class Hedger:
+    """Run streamed LLM requests with a deadline and optional hedging.
+
+    An attempt is a callable that takes a Cancel event and returns an
+    iterator of text pieces. It should stop early once the event is set.
+    """
+
+    def __init__(self, deadline=120.0, hedge_after=None, percentile=0.95,
+                 window=200, min_samples=10, default_delay=3.0):
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.default_delay = default_delay
+        self.stats = Counter()
+        self._first_token = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def hedge_delay(self):
+        """Seconds to wait for a first token before sending the backup."""
+        if self.hedge_after is not None:
+            return self.hedge_after
+        with self._lock:
+            samples = sorted(self._first_token)
+        if len(samples) < self.min_samples:
+            return self.default_delay
+        return samples[min(len(samples) - 1, int(len(samples) * self.percentile))]
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def summary(self):
+        """One-line summary of how often hedging fired."""
+        total = self.stats["requests"]
+        hedged = self.stats["hedged"]
+        rate = 100.0 * hedged / total if total else 0.0
+        return (f"🛡️  Hedging: {hedged}/{total} requests hedged ({rate:.1f}%), "
+                f"backup won {self.stats['backup_won']}, {self.stats['timeouts']} timed out")
+
+    @staticmethod
+    def _worker(attempt_id, attempt, cancel, events):
+        # The request runs here, not in the caller's thread, so profile it here.
+        # "done" is sent only after the profile is saved, so it lands in the stage
+        try:
+            with profiling.in_thread():
+                for piece in attempt(cancel):
+                    if cancel.is_set():
+                        return
+                    events.put((attempt_id, "token", piece))
+        except Exception as e:
+            events.put((attempt_id, "error", e))
+        else:
+            events.put((attempt_id, "done", None))
+
+    def run(self, primary, backup=None, deadline=None):
+        """Return the full text of whichever attempt answers first.
+
+        Raises DeadlineExceeded if nothing completes within the deadline, or
+        the attempt's own error if every attempt that was started failed.
+        """
+        deadline = self.deadline if deadline is None else deadline
+        events = queue.Queue()
+        cancels = []
+        started = []
+        failed = set()
+
+        def launch(attempt):
+            cancel = Cancel()
+            cancels.append(cancel)
+            started.append(time.monotonic())
+            threading.Thread(target=self._worker, args=(len(cancels) - 1, attempt, cancel, events),
+                             daemon=True).start()
+
+        def cancel_all(keep=None):
+            for i, cancel in enumerate(cancels):
+                if i != keep:
+                    cancel.set()
+
+        self._count("requests")
+        start = time.monotonic()
+        deadline_at = start + deadline
+        hedge_at = start + self.hedge_delay() if backup else None
+        winner = None
+        pieces = []
+        launch(primary)
+
+        while True:
+            now = time.monotonic()
+            wake_at = deadline_at if hedge_at is None else min(deadline_at, hedge_at)
+            try:
+                attempt_id, kind, payload = events.get(timeout=max(0.0, wake_at - now))
+            except queue.Empty:
+                if time.monotonic() >= deadline_at:
+                    cancel_all()
+                    self._count("timeouts")
+                    raise DeadlineExceeded(f"no answer within {deadline:g}s")
+                launch(backup)
+                hedge_at = None
+                self._count("hedged")
+                continue
+
+            if winner is not None and attempt_id != winner:
+                continue
+
+            if kind == "error":
+                if attempt_id == winner:
+                    raise payload
+                failed.add(attempt_id)
+                if hedge_at is not None:
+                    # Primary failed before the hedge fired: fail over now
+                    launch(backup)
+                    hedge_at = None
+                    self._count("hedged")
+                elif len(failed) == len(cancels):
+                    raise payload
+                continue
+
+            if winner is None:
+                winner = attempt_id
+                hedge_at = None
+                cancel_all(keep=winner)
+                with self._lock:
+                    self._first_token.append(time.monotonic() - started[winner])
+                if winner > 0:
+                    self._count("backup_won")
+
+            if kind == "done":
+                return "".join(pieces)
+            pieces.append(payload)
+
+
+def chain_attempt(chain, inputs):
+    """Make a hedger attempt that streams a LangChain chain's output.
+
+    LangChain doesn't expose the connection, so a cancelled attempt only
+    stops at its next token. Give the chain's model a client timeout (e.g.
+    ChatOllama(timeout=...)) so one stuck before its first token ends too.
+    """
+    def attempt(cancel):
+        stream = chain.stream(inputs)
+        try:
+            for chunk in stream:
+                if cancel.is_set():
+                    break
+                yield chunk.content
+        finally:
+            stream.close()
+    return attempt
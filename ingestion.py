@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Background PDF Ingestion
+Run parse -> chunk -> embed -> index for uploaded PDFs on a worker pool so
+the caller (the Chainlit event loop) stays free to answer chat messages.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from langchain_community.vectorstores import FAISS
+from embed_batcher import OllamaBatchEmbeddings, MicroBatchingEmbeddings
+from pdf_analyzer import iter_pages, split_into_chunks
+import itertools
+import threading
+import time
+import uuid
+
+EMBED_BATCH_SIZE = 32
+
+
+def merge_copy(vectorstore, other):
+    """Append other's chunks to vectorstore, leaving other untouched.
+
+    FAISS.merge_from empties the source index, which must not happen to a
+    store that other queries may still be reading (or that is mmap'd).
+    """
+    count = other.index.ntotal
+    if count == 0:
+        return
+    start = vectorstore.index.ntotal
+    vectorstore.index.add(other.index.reconstruct_n(0, count))
+    docs = {}
+    for row in range(count):
+        doc_id = str(uuid.uuid4())
+        docs[doc_id] = other.docstore.search(other.index_to_docstore_id[row])
+        vectorstore.index_to_docstore_id[start + row] = doc_id
+    vectorstore.docstore.add(docs)
+
+
+class IngestionJob:
+    """State of one PDF moving through the ingestion pipeline.
+
+    status is one of: queued, parsing, chunking, embedding, indexing,
+    ready, failed. The worker thread writes it; anyone may read it.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, pdf_path, name=None):
+        self.id = next(self._ids)
+        self.pdf_path = pdf_path
+        self.name = name or pdf_path
+        self.status = "queued"
+        self.detail = ""
+        self.vectorstore = None
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    def done(self):
+        """True once the job is ready or failed."""
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; return True if it did."""
+        return self._done.wait(timeout)
+
+    def progress(self):
+        """Human-readable progress line."""
+        icons = {"queued": "⏳", "parsing": "📄", "chunking": "✂️", "embedding": "🧠",
+                 "indexing": "🔧", "ready": "✅", "failed": "❌"}
+        line = f"{icons[self.status]} {self.name}: {self.status}"
+        if self.detail:
+            line += f" ({self.detail})"
+        if self.finished_at and self.started_at:
+            line += f" in {self.finished_at - self.started_at:.1f}s"
+        return line
+
+    def _set(self, status, detail=""):
+        self.status = status
+        self.detail = detail
+
+
+class IngestionQueue:
+    """Worker pool that ingests PDFs into FAISS vector stores.
+
+    Parsing holds the GIL, but embedding is HTTP-bound, so a few threads
+    are enough to overlap documents without starving the event loop.
+    """
+
+    def __init__(self, max_workers=2, embedding=None, dedup_threshold=0.85):
+        self.embedding = embedding or MicroBatchingEmbeddings(OllamaBatchEmbeddings(model="nomic-embed-text"))
+        self.dedup_threshold = dedup_threshold
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingest")
+
+    def submit(self, pdf_path, name=None):
+        """Queue a PDF for ingestion and return its job immediately."""
+        job = IngestionJob(pdf_path, name)
+        self._executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        job.started_at = time.monotonic()
+        try:
+            # Page text comes from the extracted-text cache when it can
+            job._set("parsing")
+            pages = list(iter_pages(job.pdf_path))
+            job._set("chunking", f"{len(pages)} pages")
+            docs = split_into_chunks(pages, self.dedup_threshold)
+
+            texts = [doc.page_content for doc in docs]
+            vectors = []
+            for start in range(0, len(texts), EMBED_BATCH_SIZE):
+                job._set("embedding", f"{start}/{len(texts)} chunks")
+                vectors.extend(self.embedding.embed_documents(texts[start:start + EMBED_BATCH_SIZE]))
+
+            job._set("indexing", f"{len(texts)} chunks")
+            job.vectorstore = FAISS.from_embeddings(
+                list(zip(texts, vectors)), self.embedding,
+                metadatas=[doc.metadata for doc in docs]
+            )
+            job._set("ready", f"{len(pages)} pages, {len(texts)} chunks")
+        except Exception as e:
+            job.error = e
+            job._set("failed", str(e))
+        finally:
+            job.finished_at = time.monotonic()
+            job._done.set()
+
+    def shutdown(self, wait=False):
+        """Stop accepting jobs."""
+        self._executor.shutdown(wait=wait)
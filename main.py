@@ -6,13 +6,22 @@ A simple command-line chat interface using Ollama and LangChain.
 
 from langchain_community.chat_models import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
+from profiling import profiled
+from router import ModelRouter, log_to
+from hedging import Hedger, DeadlineExceeded, chain_attempt
+import profiling
+import argparse
 import sys
 
-def setup_llm():
+# Shared across calls so the hedge delay tracks recent first-token latency
+hedger = Hedger()
+
+def setup_llm(model="mistral"):
     """Initialize the LLM with Ollama."""
     try:
-        # Load the LLM - default to mistral, but you can change this
-        llm = ChatOllama(model="mistral")
+        # Load the LLM - default to mistral, but you can change this.
+        # The client timeout stops requests the hedger gave up on or cancelled
+        llm = ChatOllama(model=model, timeout=int(hedger.deadline))
         print("✅ LLM loaded successfully!")
         return llm
     except Exception as e:
@@ -33,23 +42,51 @@ def create_chain(llm):
     chain = prompt | llm
     return chain
 
-def ask_agent(chain, question: str):
-    """Send a question to the agent and get a response."""
-    try:
-        response = chain.invoke({"input": question})
-        return response.content
-    except Exception as e:
-        return f"Sorry, I encountered an error: {e}"
+@profiled
+def ask_agent(chain, question: str, backup_chain=None):
+    """Send a question to the agent and get a response.
+    
+    Gives up after hedger.deadline seconds. With a backup_chain, a slow
+    first token triggers a duplicate request to it and the faster one wins.
+    Errors are raised, not returned, so the router can escalate on them.
+    """
+    inputs = {"input": question}
+    backup = chain_attempt(backup_chain, inputs) if backup_chain is not None else None
+    return hedger.run(chain_attempt(chain, inputs), backup)
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Chat with a local LLM through LangChain.")
+    parser.add_argument("--profile", metavar="DIR", help="write CPU profiles and allocation summaries per stage to DIR")
+    parser.add_argument("--deadline", type=float, default=120.0, help="give up on a response after this many seconds")
+    parser.add_argument("--hedge-model", help="send a duplicate request to this model when the first token is slow")
+    parser.add_argument("--hedge-after", type=float, help="hedge after this many seconds instead of the recent p95")
+    parser.add_argument("--small-model", default="phi3", help="fast model tried first for simple queries")
+    parser.add_argument("--large-model", default="mistral", help="model for complex queries and escalations")
+    parser.add_argument("--no-router", action="store_true", help="send every query to the large model")
+    parser.add_argument("--route-log", default="routing.log", help="file that routing decisions are logged to")
+    return parser.parse_args()
 
 def main():
     """Main chat loop."""
+    args = parse_args()
     print("🤖 Local LLM Agent - Zero Cloud Costs")
     print("=" * 50)
+    
+    if args.profile:
+        profiling.enable(args.profile)
+    
+    hedger.deadline = args.deadline
+    hedger.hedge_after = args.hedge_after
+    
     print("Loading LLM...")
     
-    # Setup
-    llm = setup_llm()
-    chain = create_chain(llm)
+    # Setup: one chain per model the router can pick
+    router = ModelRouter(args.large_model if args.no_router else args.small_model, args.large_model)
+    log_to(args.route_log)
+    chains = {model: create_chain(setup_llm(model))
+              for model in dict.fromkeys((router.small_model, router.large_model))}
+    backup_chain = create_chain(setup_llm(args.hedge_model)) if args.hedge_model else None
     
     print("\n💬 Chat started! Type 'exit' or 'quit' to end the conversation.")
     print("💡 Try asking questions like:")
@@ -71,7 +108,15 @@ def main():
                 break
             
             print("\n🤖 Assistant: ", end="", flush=True)
-            response = ask_agent(chain, user_input)
+            try:
+                response = router.route(
+                    user_input,
+                    lambda model, question: ask_agent(chains[model], question, backup_chain)
+                )
+            except DeadlineExceeded as e:
+                response = f"Sorry, I gave up waiting: {e}"
+            except Exception as e:
+                response = f"Sorry, I encountered an error: {e}"
             print(response)
             
         except KeyboardInterrupt:
@@ -79,6 +124,9 @@ def main():
             break
         except Exception as e:
             print(f"\n❌ Unexpected error: {e}")
+    
+    print(router.summary())
+    print(hedger.summary())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
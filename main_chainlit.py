@@ -2,20 +2,127 @@
 """
 Local LLM Agent - Web UI with Chainlit
 A modern web-based chat interface using Chainlit, Ollama, and LangChain.
+Attach PDFs to a message to ingest them in the background and ask
+questions about them.
 """
 
 import chainlit as cl
 from langchain_community.chat_models import ChatOllama
 from langchain_core.prompts import ChatPromptTemplate
+from hedging import Hedger, DeadlineExceeded, chain_attempt
+from router import ModelRouter, log_to
+from ingestion import IngestionQueue, merge_copy
+from embed_batcher import OllamaBatchEmbeddings, MicroBatchingEmbeddings
+from pdf_analyzer import create_qa_chain
+from shared_index import open_shared_index
+from snapshots import HotIndex, is_snapshot_root
 import asyncio
+import os
 
-# Global variables to store the chain
-chain = None
+# Global variables to store the chains, one per model the router can pick
+chains = None
+backup_chain = None
+
+# Queries go to SMALL_MODEL first and escalate to LARGE_MODEL when needed;
+# ROUTER=off sends everything to LARGE_MODEL. Decisions go to ROUTE_LOG.
+LARGE_MODEL = os.environ.get("LARGE_MODEL", "mistral")
+SMALL_MODEL = LARGE_MODEL if os.environ.get("ROUTER") == "off" else os.environ.get("SMALL_MODEL", "phi3")
+router = ModelRouter(SMALL_MODEL, LARGE_MODEL)
+log_to(os.environ.get("ROUTE_LOG", "routing.log"))
+
+# Deadline and optional hedge model come from the environment, e.g.
+# LLM_DEADLINE=60 LLM_HEDGE_MODEL=phi3 chainlit run main_chainlit.py
+HEDGE_MODEL = os.environ.get("LLM_HEDGE_MODEL")
+hedger = Hedger(deadline=float(os.environ.get("LLM_DEADLINE", "120")))
+
+# One embedding client shared by all sessions, so query embeddings arriving
+# together are sent as one request (EMBED_MAX_BATCH, EMBED_MAX_WAIT_MS)
+embedding = MicroBatchingEmbeddings(
+    OllamaBatchEmbeddings(model="nomic-embed-text"),
+    max_batch=int(os.environ.get("EMBED_MAX_BATCH", "16")),
+    max_wait_ms=float(os.environ.get("EMBED_MAX_WAIT_MS", "5"))
+)
+
+# A shared index saved with `pdf_analyzer.py --save-index DIR` is opened
+# read-only through mmap, so every worker process shares one copy in RAM.
+# A snapshot root (snapshots.py) is served hot: publishing a new snapshot
+# switches every worker over on its next query, without a restart.
+SHARED_INDEX = os.environ.get("SHARED_INDEX")
+if SHARED_INDEX and is_snapshot_root(SHARED_INDEX):
+    shared_vectorstore = HotIndex(SHARED_INDEX, embedding)
+else:
+    shared_vectorstore = open_shared_index(SHARED_INDEX, embedding) if SHARED_INDEX else None
+
+# One worker pool shared by all sessions; size it with INGEST_WORKERS
+ingestion_queue = IngestionQueue(max_workers=int(os.environ.get("INGEST_WORKERS", "2")), embedding=embedding)
+
+# Progress-tracking tasks for uploads that are still being ingested
+ingestion_tasks = set()
+
+def is_pdf(element):
+    """True for uploaded elements that look like PDFs."""
+    return bool(getattr(element, "path", None)) and (
+        getattr(element, "mime", None) == "application/pdf"
+        or (element.name or "").lower().endswith(".pdf")
+    )
+
+async def track_ingestion(job, progress_message):
+    """Stream a job's progress to the browser, then make its index queryable."""
+    last = None
+    while not job.done():
+        if job.progress() != last:
+            last = job.progress()
+            progress_message.content = last
+            await progress_message.update()
+        await asyncio.sleep(0.5)
+    
+    progress_message.content = job.progress()
+    await progress_message.update()
+    if job.status != "ready":
+        return
+    
+    # Uploads go into a small store of the session's own, searched next to
+    # the shared index, which is never copied. Earlier uploads are copied
+    # into the new store rather than the other way round, so queries still
+    # running against the old one are untouched. Merges in one session run
+    # one at a time, each on top of the last, so two PDFs finishing
+    # together both end up in the session's uploads.
+    async with cl.user_session.get("merge_lock"):
+        uploads = job.vectorstore
+        current = cl.user_session.get("uploads")
+        if current is not None:
+            await cl.make_async(merge_copy)(uploads, current)
+        qa_chain = await cl.make_async(create_qa_chain)(cl.user_session.get("llm"), shared_vectorstore,
+                                                        uploads=uploads)
+        cl.user_session.set("uploads", uploads)
+        cl.user_session.set("qa_chain", qa_chain)
+    
+    await cl.Message(
+        content=f"📚 {job.name} is ready. Questions are now answered from your documents.",
+        author="System"
+    ).send()
+
+async def answer_from_documents(qa_chain, question):
+    """Answer through the retrieval QA chain, listing the source pages."""
+    # The deadline frees this session; the worker thread finishes on its own
+    result = await asyncio.wait_for(
+        cl.make_async(qa_chain.invoke)({"query": question}),
+        timeout=hedger.deadline
+    )
+    content = result["result"]
+    sources = result.get("source_documents") or []
+    if sources:
+        content += "\n\n📚 Sources:"
+        for i, doc in enumerate(sources[:2], 1):
+            pages = doc.metadata.get("pages") or [doc.metadata.get("page", "Unknown")]
+            source = os.path.basename(doc.metadata.get("source", ""))
+            content += f"\n{i}. {source} page {', '.join(str(p) for p in pages)}: {doc.page_content[:100]}..."
+    return content
 
 @cl.on_chat_start
 async def start():
     """Initialize the chat session."""
-    global chain
+    global chains, backup_chain
     
     # Show loading message
     await cl.Message(
@@ -24,8 +131,12 @@ async def start():
     ).send()
     
     try:
-        # Initialize LLM
-        llm = ChatOllama(model="mistral")
+        # Initialize LLM; document Q&A always uses the large model
+        llm = ChatOllama(model=LARGE_MODEL, timeout=int(hedger.deadline))
+        cl.user_session.set("llm", llm)
+        cl.user_session.set("merge_lock", asyncio.Lock())
+        if shared_vectorstore is not None:
+            cl.user_session.set("qa_chain", create_qa_chain(llm, shared_vectorstore))
         
         # Create prompt template
         prompt = ChatPromptTemplate.from_messages([
@@ -33,12 +144,17 @@ async def start():
             ("human", "{input}")
         ])
         
-        # Create the chain
-        chain = prompt | llm
+        # Create the chains
+        # The client timeout stops requests the hedger gave up on or cancelled
+        timeout = llm.timeout
+        chains = {model: prompt | ChatOllama(model=model, timeout=timeout)
+                  for model in dict.fromkeys((SMALL_MODEL, LARGE_MODEL))}
+        if HEDGE_MODEL:
+            backup_chain = prompt | ChatOllama(model=HEDGE_MODEL, timeout=timeout)
         
         # Welcome message
         await cl.Message(
-            content="✅ Local LLM Agent loaded successfully!\n\n💬 You can now start chatting with your local AI assistant. No cloud costs, no API keys, just pure local processing!",
+            content="✅ Local LLM Agent loaded successfully!\n\n💬 You can now start chatting with your local AI assistant. No cloud costs, no API keys, just pure local processing!\n\n📄 Attach PDFs to a message to ask questions about them. They are indexed in the background while you keep chatting.",
             author="System"
         ).send()
         
@@ -52,15 +168,26 @@ async def start():
 @cl.on_message
 async def main(message: cl.Message):
     """Handle incoming messages."""
-    global chain
-    
-    if chain is None:
+    if chains is None:
         await cl.Message(
             content="❌ LLM not initialized. Please restart the chat.",
             author="System"
         ).send()
         return
     
+    # Queue uploaded PDFs and return straight away; progress streams in
+    pdfs = [element for element in (message.elements or []) if is_pdf(element)]
+    for element in pdfs:
+        job = ingestion_queue.submit(element.path, element.name)
+        progress_message = cl.Message(content=job.progress(), author="System")
+        await progress_message.send()
+        # Keep a reference so the task isn't garbage-collected while it runs
+        task = asyncio.create_task(track_ingestion(job, progress_message))
+        ingestion_tasks.add(task)
+        task.add_done_callback(ingestion_tasks.discard)
+    if pdfs and not message.content.strip():
+        return
+    
     try:
         # Show typing indicator
         await cl.Message(
@@ -68,15 +195,29 @@ async def main(message: cl.Message):
             author="Assistant"
         ).send()
         
-        # Get response from the chain
-        response = chain.invoke({"input": message.content})
+        qa_chain = cl.user_session.get("qa_chain")
+        if qa_chain is not None:
+            response = await answer_from_documents(qa_chain, message.content)
+        else:
+            # Get response from the routed chain without blocking other sessions
+            def ask(model, question):
+                inputs = {"input": question}
+                backup = chain_attempt(backup_chain, inputs) if backup_chain is not None else None
+                return hedger.run(chain_attempt(chains[model], inputs), backup)
+            
+            response = await cl.make_async(router.route)(message.content, ask)
         
         # Send the response
         await cl.Message(
-            content=response.content,
+            content=response,
             author="Assistant"
         ).send()
         
+    except (DeadlineExceeded, asyncio.TimeoutError) as e:
+        await cl.Message(
+            content=f"⏱️ Sorry, I gave up waiting for the model: {str(e) or 'no answer in time'}",
+            author="System"
+        ).send()
     except Exception as e:
         await cl.Message(
             content=f"❌ Sorry, I encountered an error: {e}",
@@ -86,6 +227,9 @@ async def main(message: cl.Message):
 @cl.on_chat_end
 async def end():
     """Handle chat end."""
+    print(router.summary())
+    print(hedger.summary())
+    print(f"🧠 Query embeddings: {embedding.stats()}")
     await cl.Message(
         content="👋 Thanks for using your local LLM agent!",
         author="System"
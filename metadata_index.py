@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Metadata-Filtered Retrieval
+Keep chunk metadata (source file, pages, section, ingest date) in compact
+columnar arrays with precomputed ID sets, and apply them as a prefilter
+inside the FAISS search instead of over-fetching and filtering in Python.
+"""
+
+import heapq
+import json
+import os
+import re
+import shlex
+from contextlib import nullcontext
+from datetime import date
+from typing import Any, Dict, List
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from page_cache import SECTION_SEPARATOR
+
+FILTER_KEYS = ("source", "pages", "section", "since", "until")
+# Leading numbering of an outline title: "2.1 ", "IV. ", "Section 4: ", "Chapter 3 - "
+SECTION_NUMBER = re.compile(r"^(?:(?:chapter|section|part)\s+(?:\d+(?:\.\d+)*|[ivxlc]+)|\d+(?:\.\d+)*|"
+                            r"[ivxlc]+(?=[.:)]))\s*[:.)-]?\s+(?=\S)", re.I)
+
+
+def _to_day(value):
+    """Convert an ISO date string or date to days since the epoch."""
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.toordinal() - date(1970, 1, 1).toordinal()
+
+
+def parse_page_range(text):
+    """Parse '40-60' or '7' into an inclusive (first, last) page range."""
+    first, _, last = text.partition("-")
+    first = int(first)
+    return first, int(last) if last else first
+
+
+def parse_date(text):
+    """Check that text is a YYYY-MM-DD date and return it unchanged."""
+    date.fromisoformat(text)
+    return text
+
+
+def parse_filter_spec(text):
+    """Parse 'pages=40-60 source=report.pdf section="Part II"' into filters.
+
+    Values with spaces are quoted as in a shell.
+    """
+    filters = {}
+    for part in shlex.split(text):
+        key, sep, value = part.partition("=")
+        if not sep or key not in FILTER_KEYS:
+            raise ValueError(f"Unknown filter '{part}'. Use: {', '.join(k + '=' for k in FILTER_KEYS)}")
+        try:
+            if key == "pages":
+                value = parse_page_range(value)
+            elif key in ("since", "until"):
+                value = parse_date(value)
+        except ValueError:
+            raise ValueError(f"Invalid filter '{part}'") from None
+        filters[key] = value
+    return filters
+
+
+def section_names(section):
+    """Lowercased names a section path can be selected by.
+
+    Every component of the path matches, with or without its numbering,
+    so "Methods" and "2 Methods" both select "2 Methods > 2.1 Data".
+    """
+    names = {section.lower()}
+    for part in section.split(SECTION_SEPARATOR):
+        names.add(part.lower())
+        names.add(SECTION_NUMBER.sub("", part).lower())
+    return names
+
+
+def describe_filters(filters):
+    """Render active filters the same way they are typed."""
+    if not filters:
+        return "none"
+    parts = []
+    for key, value in filters.items():
+        if key == "pages":
+            value = f"{value[0]}-{value[1]}"
+        parts.append(f"{key}={shlex.quote(str(value))}")
+    return " ".join(parts)
+
+
+class MetadataIndex:
+    """Columnar chunk metadata keyed by FAISS row id.
+
+    Categorical columns (source, section) are dictionary-encoded with an
+    inverted list of row ids per value. Pages use a CSR layout so a chunk
+    collapsed from several pages matches any of them, plus a page-sorted
+    copy for range lookups. Ingest dates are stored as sorted day numbers.
+    """
+
+    ARRAYS = ("source_codes", "section_codes", "page_offsets", "page_values", "ingest_days",
+              "_source_order", "_source_bounds", "_section_order", "_section_bounds",
+              "_sorted_pages", "_sorted_page_rows", "_sorted_days", "_sorted_day_rows")
+
+    def __init__(self, metadatas):
+        self.size = len(metadatas)
+        self.source_values, self.source_codes = self._encode([m.get("source") for m in metadatas])
+        self.section_values, self.section_codes = self._encode([m.get("section") for m in metadatas])
+        self._source_order, self._source_bounds = self._postings(self.source_codes, len(self.source_values))
+        self._section_order, self._section_bounds = self._postings(self.section_codes, len(self.section_values))
+
+        page_lists = [m.get("pages") or ([m["page"]] if "page" in m else []) for m in metadatas]
+        self.page_offsets = np.zeros(self.size + 1, dtype=np.int64)
+        self.page_offsets[1:] = np.cumsum([len(p) for p in page_lists])
+        self.page_values = np.fromiter((p for pages in page_lists for p in pages), dtype=np.int32,
+                                       count=int(self.page_offsets[-1]))
+        page_rows = np.repeat(np.arange(self.size, dtype=np.int64), np.diff(self.page_offsets))
+        order = np.argsort(self.page_values, kind="stable")
+        self._sorted_pages = self.page_values[order]
+        self._sorted_page_rows = page_rows[order]
+
+        days = [_to_day(m["ingested_at"]) if m.get("ingested_at") else -1 for m in metadatas]
+        self.ingest_days = np.array(days, dtype=np.int32)
+        order = np.argsort(self.ingest_days, kind="stable")
+        self._sorted_days = self.ingest_days[order]
+        self._sorted_day_rows = order.astype(np.int64)
+
+    @staticmethod
+    def _encode(values):
+        """Dictionary-encode a column of strings into int32 codes."""
+        lookup = {}
+        codes = np.array([lookup.setdefault(v, len(lookup)) for v in values], dtype=np.int32)
+        return list(lookup), codes
+
+    @staticmethod
+    def _postings(codes, n_values):
+        """Group row ids by value: rows of value v are order[bounds[v]:bounds[v + 1]]."""
+        order = np.argsort(codes, kind="stable").astype(np.int64)
+        bounds = np.searchsorted(codes[order], np.arange(n_values + 1)).astype(np.int64)
+        return order, bounds
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        """Build the index from a langchain FAISS store, in FAISS row order.
+
+        Stores that persist their own index (see shared_index.py) return it
+        as is instead of re-reading every chunk's metadata.
+        """
+        if getattr(vectorstore, "metadata_index", None) is not None:
+            return vectorstore.metadata_index
+        docstore_ids = vectorstore.index_to_docstore_id
+        metadatas = [vectorstore.docstore.search(docstore_ids[i]).metadata for i in range(len(docstore_ids))]
+        return cls(metadatas)
+
+    def save(self, directory):
+        """Write every column to directory as .npy files plus a JSON header."""
+        for name in self.ARRAYS:
+            np.save(os.path.join(directory, f"meta_{name.lstrip('_')}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "meta_values.json"), "w") as f:
+            json.dump({"size": self.size, "source_values": self.source_values,
+                       "section_values": self.section_values}, f)
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Load an index saved with save(), memory-mapping its columns."""
+        index = cls.__new__(cls)
+        with open(os.path.join(directory, "meta_values.json")) as f:
+            header = json.load(f)
+        index.size = header["size"]
+        index.source_values = header["source_values"]
+        index.section_values = header["section_values"]
+        for name in cls.ARRAYS:
+            setattr(index, name, np.load(os.path.join(directory, f"meta_{name.lstrip('_')}.npy"),
+                                         mmap_mode="r" if mmap else None))
+        return index
+
+    def _match_values(self, values, wanted, order, bounds):
+        matches = [order[bounds[code]:bounds[code + 1]] for code, value in enumerate(values)
+                   if value is not None and (value == wanted or os.path.basename(value) == wanted)]
+        return np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64)
+
+    def select(self, source=None, pages=None, section=None, since=None, until=None):
+        """Return the sorted FAISS row ids matching every given filter.
+
+        Returns None when no filter is set, meaning "search everything".
+        """
+        selected = None
+
+        def narrow(ids):
+            return ids if selected is None else np.intersect1d(selected, ids, assume_unique=True)
+
+        if source is not None:
+            selected = narrow(self._match_values(self.source_values, source,
+                                                     self._source_order, self._source_bounds))
+        if section is not None:
+            # A section also matches its subsections: "Methods" matches "2 Methods > 2.1 Data"
+            wanted = section.strip().lower()
+            codes = [code for code, value in enumerate(self.section_values)
+                     if value is not None and wanted in section_names(value)]
+            matches = [self._section_order[self._section_bounds[c]:self._section_bounds[c + 1]] for c in codes]
+            selected = narrow(np.unique(np.concatenate(matches)) if matches else np.empty(0, dtype=np.int64))
+        if pages is not None:
+            lo = np.searchsorted(self._sorted_pages, pages[0], side="left")
+            hi = np.searchsorted(self._sorted_pages, pages[1], side="right")
+            selected = narrow(np.unique(self._sorted_page_rows[lo:hi]))
+        if since is not None or until is not None:
+            lo = np.searchsorted(self._sorted_days, _to_day(since) if since else 0, side="left")
+            hi = (np.searchsorted(self._sorted_days, _to_day(until), side="right")
+                  if until else len(self._sorted_days))
+            selected = narrow(np.sort(self._sorted_day_rows[lo:hi]))
+        return selected
+
+
+def filtered_search(vectorstore, metadata_index, vector, k, filters):
+    """Return the top-k (document, distance) pairs among rows matching filters."""
+    ids = metadata_index.select(**filters)
+    if ids is not None and len(ids) == 0:
+        return []
+
+    vector = np.array([vector], dtype=np.float32)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(vector)
+
+    params = None
+    if ids is not None:
+        params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(ids))
+    distances, rows = vectorstore.index.search(vector, k, params=params)
+
+    hits = []
+    for distance, row in zip(distances[0], rows[0]):
+        if row == -1:
+            continue
+        docstore_id = vectorstore.index_to_docstore_id[int(row)]
+        hits.append((vectorstore.docstore.search(docstore_id), float(distance)))
+    return hits
+
+
+class FilteredRetriever(BaseRetriever):
+    """Retriever that prefilters FAISS rows by chunk metadata."""
+
+    vectorstore: Any
+    metadata_index: Any
+    k: int = 3
+    filters: Dict[str, Any] = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        vector = self.vectorstore._embed_query(query)
+        hits = filtered_search(self.vectorstore, self.metadata_index, vector, self.k, self.filters)
+        return [doc for doc, _ in hits]
+
+
+class SessionRetriever(BaseRetriever):
+    """Filtered retrieval over a shared index plus one session's own uploads.
+
+    Uploads are kept in a small store of their own instead of being merged
+    into a copy of the shared index, so a session's memory grows with what
+    it uploaded, not with the corpus. Both stores are searched and their
+    top-k merged by distance, as ShardedIndex does across shards. A hot
+    index (snapshots.py) is pinned per query, so new snapshots are seen.
+    """
+
+    base: Any = None
+    uploads: Any
+    uploads_index: Any
+    k: int = 3
+    filters: Dict[str, Any] = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        vector = self.uploads._embed_query(query)
+        hits = filtered_search(self.uploads, self.uploads_index, vector, self.k, self.filters)
+        if self.base is not None:
+            pinned = self.base.pin() if hasattr(self.base, "pin") else nullcontext(self.base)
+            with pinned as vectorstore:
+                hits += filtered_search(vectorstore, MetadataIndex.from_vectorstore(vectorstore),
+                                        vector, self.k, self.filters)
+        higher_is_better = self.uploads.distance_strategy in (DistanceStrategy.MAX_INNER_PRODUCT,
+                                                              DistanceStrategy.DOT_PRODUCT)
+        pick = heapq.nlargest if higher_is_better else heapq.nsmallest
+        return [doc for doc, _ in pick(self.k, hits, key=lambda hit: hit[1])]
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Extracted Page Text Cache
+Store the text pypdf extracts from each PDF page in a small SQLite file,
+compressed, keyed by (file hash, page number, extractor version), so
+re-chunking a document with different settings, or resuming an interrupted
+ingest, never re-parses the PDF. Extraction itself is page by page, so an
+interrupted run keeps every page it finished.
+
+The key uses the file's contents, not its path, so a renamed or copied PDF
+still hits the cache, and upgrading pypdf starts a fresh set of entries.
+
+Each page is also tagged with its section from the PDF outline
+(bookmarks), as a path like "2 Methods > 2.1 Data", so retrieval can be
+restricted to one section.
+"""
+
+from contextlib import closing
+from langchain_core.documents import Document
+import hashlib
+import json
+import sqlite3
+import zlib
+import pypdf
+
+# Bump the suffix when the extraction code below changes its output
+EXTRACTOR_VERSION = f"pypdf-{pypdf.__version__}/1"
+DEFAULT_PATH = ".page_cache.sqlite"
+SECTION_SEPARATOR = " > "
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    file_hash TEXT, extractor TEXT, page_count INTEGER,
+    PRIMARY KEY (file_hash, extractor)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    file_hash TEXT, page INTEGER, extractor TEXT, page_label TEXT, text BLOB,
+    PRIMARY KEY (file_hash, page, extractor)
+);
+CREATE TABLE IF NOT EXISTS sections (
+    file_hash TEXT, extractor TEXT, page_sections TEXT,
+    PRIMARY KEY (file_hash, extractor)
+);
+"""
+
+
+def document_hash(pdf_path):
+    """SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def page_sections(reader):
+    """Section path of every page from the outline, None before the first entry."""
+    starts = []
+
+    def walk(entries, path):
+        last = None
+        for entry in entries:
+            if isinstance(entry, list):
+                # A nested list holds the children of the entry before it
+                if last is not None:
+                    walk(entry, path + [last])
+                continue
+            last = entry.title.strip()
+            try:
+                page = reader.get_destination_page_number(entry)
+            except Exception:
+                page = None
+            if page is not None and page >= 0:
+                starts.append((page, len(starts), SECTION_SEPARATOR.join(path + [last])))
+
+    try:
+        walk(reader.outline, [])
+    except Exception:
+        # A broken outline shouldn't stop text extraction
+        starts = []
+    # Entries sharing a start page: the last one listed (the deepest) wins
+    starts.sort()
+    sections, current, i = [], None, 0
+    for page in range(len(reader.pages)):
+        while i < len(starts) and starts[i][0] <= page:
+            current = starts[i][2]
+            i += 1
+        sections.append(current)
+    return sections
+
+
+class PageCache:
+    """SQLite store of zlib-compressed page texts.
+
+    Every call opens its own connection, so one cache can be used from
+    ingestion threads and build processes at the same time.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        with closing(self._connect()) as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def iter_pages(self, pdf_path):
+        """Yield one Document per page, extracting only pages not cached yet."""
+        file_hash = document_hash(pdf_path)
+        with closing(self._connect()) as db:
+            row = db.execute("SELECT page_count FROM files WHERE file_hash = ? AND extractor = ?",
+                             (file_hash, EXTRACTOR_VERSION)).fetchone()
+            reader = None
+            if row is None:
+                reader = pypdf.PdfReader(pdf_path)
+                page_count = len(reader.pages)
+                with db:
+                    db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                               (file_hash, EXTRACTOR_VERSION, page_count))
+            else:
+                page_count = row[0]
+
+            row = db.execute("SELECT page_sections FROM sections WHERE file_hash = ? AND extractor = ?",
+                             (file_hash, EXTRACTOR_VERSION)).fetchone()
+            if row is not None:
+                sections = json.loads(row[0])
+            else:
+                reader = reader or pypdf.PdfReader(pdf_path)
+                sections = page_sections(reader)
+                with db:
+                    db.execute("INSERT OR REPLACE INTO sections VALUES (?, ?, ?)",
+                               (file_hash, EXTRACTOR_VERSION, json.dumps(sections)))
+
+            for page in range(page_count):
+                row = db.execute("SELECT page_label, text FROM pages WHERE file_hash = ? AND page = ? "
+                                 "AND extractor = ?", (file_hash, page, EXTRACTOR_VERSION)).fetchone()
+                if row is not None:
+                    page_label, text = row[0], zlib.decompress(row[1]).decode("utf-8")
+                else:
+                    # Open the PDF only once a page is actually missing
+                    reader = reader or pypdf.PdfReader(pdf_path)
+                    page_label = reader.page_labels[page]
+                    text = reader.pages[page].extract_text(extraction_mode="plain").strip()
+                    # Commit per page so an interrupted ingest resumes where it stopped
+                    with db:
+                        db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                                   (file_hash, page, EXTRACTOR_VERSION, page_label,
+                                    zlib.compress(text.encode("utf-8"))))
+                metadata = {"source": pdf_path, "page": page, "page_label": page_label,
+                            "total_pages": page_count}
+                if sections[page] is not None:
+                    metadata["section"] = sections[page]
+                yield Document(page_content=text, metadata=metadata)
+
+    def stats(self):
+        """(files, pages, compressed bytes) currently cached."""
+        with closing(self._connect()) as db:
+            files = db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            pages, size = db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(text)), 0) FROM pages").fetchone()
+        return files, pages, size
@@ -5,14 +5,31 @@ Load PDF documents and answer questions about them using vector search.
 """
 
 from langchain_community.chat_models import ChatOllama
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import CharacterTextSplitter
+from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import OllamaEmbeddings
 from langchain.chains import RetrievalQA
+from dedup import collapse_near_duplicates, strip_repeated_lines
+from page_cache import PageCache
+from embed_batcher import OllamaBatchEmbeddings, MicroBatchingEmbeddings
+from shared_index import save_shared_index, open_shared_index
+from sharded_index import ShardedIndex, ShardedRetriever, is_sharded_index
+from snapshots import HotIndex, HotRetriever, is_snapshot_root
+from summarizer import Summarizer, document_chunks
+from profiling import profiled
+import profiling
+from metadata_index import MetadataIndex, FilteredRetriever, SessionRetriever, parse_filter_spec, parse_page_range, parse_date, describe_filters
+from datetime import date
+import argparse
 import os
 import sys
 
+# Chunk size and overlap in characters
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 50
+
+# Opened on first use, so importing this module doesn't create the cache file
+page_cache = None
+
 def setup_llm():
     """Initialize the LLM with Ollama."""
     try:
@@ -25,31 +42,77 @@ def setup_llm():
         print("Try: ollama run mistral")
         sys.exit(1)
 
+def default_embedding():
+    """Ollama embeddings with concurrent queries coalesced into batches."""
+    return MicroBatchingEmbeddings(OllamaBatchEmbeddings(model="nomic-embed-text"))
+
+def iter_pages(pdf_path):
+    """Yield a PDF's pages one at a time, stamped with today's ingest date.
+
+    Page text comes from the extracted-text cache, so a PDF is only parsed
+    the first time it is seen.
+    """
+    global page_cache
+    if page_cache is None:
+        page_cache = PageCache()
+    ingested_at = date.today().isoformat()
+    for page in page_cache.iter_pages(pdf_path):
+        page.metadata["ingested_at"] = ingested_at
+        yield page
+
+def read_pdf(pdf_path):
+    """Read a PDF into page documents stamped with today's ingest date."""
+    return list(iter_pages(pdf_path))
+
+@profiled
 def load_pdf(pdf_path):
     """Load and split PDF document."""
     try:
         print(f"📄 Loading PDF: {pdf_path}")
-        loader = PyPDFLoader(pdf_path)
-        pages = loader.load_and_split()
+        pages = read_pdf(pdf_path)
         print(f"✅ Loaded {len(pages)} pages from PDF")
         return pages
     except Exception as e:
         print(f"❌ Error loading PDF: {e}")
         sys.exit(1)
 
-def create_vectorstore(documents):
+def split_into_chunks(documents, dedup_threshold=0.85):
+    """Split pages (a list or an iterator) into chunks and collapse near-duplicate chunks."""
+    # Headers and footers sit inside each page's text, so take them out
+    # before splitting; each file's boilerplate becomes one chunk of its own
+    if dedup_threshold:
+        pages = list(documents)
+        documents = strip_repeated_lines(pages)
+        # Only the boilerplate chunks carry "pages": the pages each was stripped from
+        stripped = sum(len(doc.metadata["pages"]) for doc in documents if "pages" in doc.metadata)
+        if stripped:
+            print(f"🧹 Stripped repeated headers and footers from {stripped} of {len(pages)} pages")
+    # Falls back from blank lines to lines, then words, so dense pages still split
+    splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    docs = [chunk for page in documents for chunk in splitter.split_documents([page])]
+    print(f"✅ Split into {len(docs)} chunks")
+    
+    # Collapse repeated headers, footers and disclaimers into one chunk
+    if dedup_threshold:
+        unique_docs = collapse_near_duplicates(docs, threshold=dedup_threshold)
+        if len(unique_docs) < len(docs):
+            print(f"🧹 Collapsed {len(docs) - len(unique_docs)} near-duplicate chunks")
+        docs = unique_docs
+    return docs
+
+@profiled
+def create_vectorstore(documents, dedup_threshold=0.85, embedding=None):
     """Create vector store from documents."""
     try:
         print("🔧 Creating vector store...")
         
         # Split documents into chunks
-        splitter = CharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-        docs = splitter.split_documents(documents)
-        print(f"✅ Split into {len(docs)} chunks")
+        docs = split_into_chunks(documents, dedup_threshold)
         
         # Create embeddings
         print("🧠 Creating embeddings...")
-        embedding = OllamaEmbeddings(model="nomic-embed-text")
+        if embedding is None:
+            embedding = default_embedding()
         
         # Create vector store
         vectorstore = FAISS.from_documents(docs, embedding)
@@ -62,10 +125,58 @@ def create_vectorstore(documents):
         print("ollama pull nomic-embed-text")
         sys.exit(1)
 
-def create_qa_chain(llm, vectorstore):
-    """Create a retrieval-based QA chain."""
+def open_index(index_dir, embedding=None):
+    """Open a shared index saved with --save-index, read-only via mmap.
+
+    A sharded index (built with sharded_index.py) is searched through one
+    worker process per shard instead, and a snapshot root (snapshots.py)
+    is served as a hot index that can be rebuilt without downtime.
+    """
     try:
-        retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+        if is_snapshot_root(index_dir):
+            print(f"📂 Opening snapshot root: {index_dir}")
+            hot = HotIndex(index_dir, embedding or default_embedding())
+            print(f"✅ Serving snapshot {hot.version}")
+            return hot
+        if is_sharded_index(index_dir):
+            print(f"📂 Opening sharded index: {index_dir}")
+            index = ShardedIndex(index_dir, embedding or default_embedding())
+            print(f"✅ Opened {index.chunks} chunks in {index.n_shards} shards")
+            return index
+        print(f"📂 Opening shared index: {index_dir}")
+        vectorstore = open_shared_index(index_dir, embedding or default_embedding())
+        print(f"✅ Opened {vectorstore.index.ntotal} chunks")
+        return vectorstore
+    except Exception as e:
+        print(f"❌ Error opening index: {e}")
+        sys.exit(1)
+
+def create_qa_chain(llm, vectorstore, filters=None, uploads=None):
+    """Create a retrieval-based QA chain.
+
+    With uploads (a session's own FAISS store), retrieval searches it
+    alongside vectorstore, which may then be None.
+    """
+    try:
+        if uploads is not None:
+            retriever = SessionRetriever(
+                base=vectorstore,
+                uploads=uploads,
+                uploads_index=MetadataIndex.from_vectorstore(uploads),
+                k=3,
+                filters=filters or {}
+            )
+        elif isinstance(vectorstore, ShardedIndex):
+            retriever = ShardedRetriever(index=vectorstore, k=3, filters=filters or {})
+        elif isinstance(vectorstore, HotIndex):
+            retriever = HotRetriever(index=vectorstore, k=3, filters=filters or {})
+        else:
+            retriever = FilteredRetriever(
+                vectorstore=vectorstore,
+                metadata_index=MetadataIndex.from_vectorstore(vectorstore),
+                k=3,
+                filters=filters or {}
+            )
         qa_chain = RetrievalQA.from_chain_type(
             llm=llm, 
             retriever=retriever,
@@ -76,6 +187,7 @@ def create_qa_chain(llm, vectorstore):
         print(f"❌ Error creating QA chain: {e}")
         sys.exit(1)
 
+@profiled
 def ask_question(qa_chain, question):
     """Ask a question and get an answer."""
     try:
@@ -90,20 +202,56 @@ def ask_question(qa_chain, question):
         if 'source_documents' in result and result['source_documents']:
             print("\n📚 Sources:")
             for i, doc in enumerate(result['source_documents'][:2], 1):
-                page_num = doc.metadata.get('page', 'Unknown')
-                print(f"   {i}. Page {page_num}: {doc.page_content[:100]}...")
+                pages = doc.metadata.get('pages') or [doc.metadata.get('page', 'Unknown')]
+                label = "Page" if len(pages) == 1 else "Pages"
+                page_list = ", ".join(str(p) for p in pages)
+                print(f"   {i}. {label} {page_list}: {doc.page_content[:100]}...")
         
         return result['result']
     except Exception as e:
         print(f"❌ Error getting answer: {e}")
         return None
 
-def interactive_mode(qa_chain):
+@profiled
+def summarize_document(llm, vectorstore, max_concurrency=4):
+    """Summarize the whole document with parallel map-reduce."""
+    try:
+        summarizer = Summarizer(llm, max_concurrency=max_concurrency, chunk_chars=CHUNK_SIZE)
+        if isinstance(vectorstore, HotIndex):
+            with vectorstore.pin() as snapshot:
+                chunks = document_chunks(snapshot)
+        elif isinstance(vectorstore, ShardedIndex):
+            chunks = document_chunks(*vectorstore.shards())
+        else:
+            chunks = document_chunks(vectorstore)
+        summary = summarizer.summarize(chunks)
+        print(f"\n📝 Summary: {summary}")
+        print(f"   ({summarizer.calls} model calls, {summarizer.cache_hits} cached summaries reused)")
+        return summary
+    except Exception as e:
+        print(f"❌ Error summarizing document: {e}")
+        return None
+
+def report_reindex(future):
+    """Print the outcome of a background rebuild."""
+    try:
+        print(f"\n✅ Switched to snapshot {future.result()}")
+    except Exception as e:
+        print(f"\n❌ Rebuild failed, still serving the old snapshot: {e}")
+
+def interactive_mode(qa_chain, llm=None):
     """Run interactive question-answering mode."""
     print("\n💬 Interactive PDF Analysis Mode")
     print("=" * 50)
     print("Ask questions about your PDF document.")
-    print("Type 'exit' or 'quit' to end the session.")
+    print("Type '/filter pages=40-60 section=\"Part II\"' to narrow the search,")
+    print("'/filter clear' to reset it, '/summarize' to summarize the whole document,")
+    print("and 'exit' or 'quit' to end the session.")
+    hot = getattr(qa_chain.retriever, "index", None)
+    if isinstance(hot, HotIndex):
+        print("'/reindex [file.pdf ...]' rebuilds the index and '/add file.pdf ...' adds or")
+        print("replaces documents, both in the background while you keep asking.")
+    print(f"🔎 Active filters: {describe_filters(qa_chain.retriever.filters)}")
     print("-" * 50)
     
     while True:
@@ -117,6 +265,33 @@ def interactive_mode(qa_chain):
                 print("\n👋 Goodbye! Thanks for using the PDF analyzer!")
                 break
             
+            if question == "/summarize" and llm is not None:
+                retriever = qa_chain.retriever
+                summarize_document(llm, getattr(retriever, "vectorstore", None) or retriever.index)
+                continue
+            
+            if question.split()[0] in ("/reindex", "/add") and isinstance(hot, HotIndex):
+                command, *paths = question.split()
+                if command == "/add" and not paths:
+                    print("❌ Usage: /add file.pdf ...")
+                    continue
+                future = hot.update(paths) if command == "/add" else hot.rebuild(paths or None)
+                future.add_done_callback(report_reindex)
+                print(f"🔄 Building a new snapshot in the background (serving {hot.version} meanwhile)")
+                continue
+            
+            if question.startswith("/filter"):
+                spec = question[len("/filter"):].strip()
+                try:
+                    if spec == "clear":
+                        qa_chain.retriever.filters = {}
+                    elif spec:
+                        qa_chain.retriever.filters = parse_filter_spec(spec)
+                except ValueError as e:
+                    print(f"❌ {e}")
+                print(f"🔎 Active filters: {describe_filters(qa_chain.retriever.filters)}")
+                continue
+            
             ask_question(qa_chain, question)
             
         except KeyboardInterrupt:
@@ -125,14 +300,47 @@ def interactive_mode(qa_chain):
         except Exception as e:
             print(f"\n❌ Unexpected error: {e}")
 
+def batch_mode(qa_chain, questions_path):
+    """Answer every question in a file, one question per line."""
+    with open(questions_path) as f:
+        questions = [line.strip() for line in f if line.strip()]
+    
+    print(f"\n📋 Batch mode: {len(questions)} questions from {questions_path}")
+    print(f"🔎 Active filters: {describe_filters(qa_chain.retriever.filters)}")
+    for question in questions:
+        ask_question(qa_chain, question)
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Ask questions about a PDF document.")
+    parser.add_argument("pdf_path", nargs="?", help="PDF to analyze (defaults to the one in this directory)")
+    parser.add_argument("--index", metavar="DIR", help="query a shared index saved with --save-index instead of a PDF")
+    parser.add_argument("--save-index", metavar="DIR", help="save the vector store as a shared, memory-mappable index")
+    parser.add_argument("--questions", help="answer the questions in this file (one per line) and exit")
+    parser.add_argument("--summarize", action="store_true", help="summarize the whole document and exit")
+    parser.add_argument("--summary-concurrency", type=int, default=4, help="parallel model calls while summarizing")
+    parser.add_argument("--pages", type=parse_page_range, help="only search these pages, e.g. 40-60")
+    parser.add_argument("--source", help="only search chunks from this file")
+    parser.add_argument("--section", help="only search chunks from this PDF outline section (or its subsections)")
+    parser.add_argument("--since", type=parse_date, help="only search chunks ingested on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--until", type=parse_date, help="only search chunks ingested on or before this date (YYYY-MM-DD)")
+    parser.add_argument("--profile", metavar="DIR", help="write CPU profiles and allocation summaries per stage to DIR")
+    return parser.parse_args()
+
 def main():
     """Main function."""
+    args = parse_args()
     print("📚 Local LLM Agent - PDF Analyzer")
     print("=" * 50)
     
+    if args.profile:
+        profiling.enable(args.profile)
+    
     # Check if PDF file is provided
-    if len(sys.argv) > 1:
-        pdf_path = sys.argv[1]
+    if args.index:
+        pdf_path = None
+    elif args.pdf_path:
+        pdf_path = args.pdf_path
     else:
         # Look for PDF files in current directory
         pdf_files = [f for f in os.listdir('.') if f.endswith('.pdf')]
@@ -161,17 +369,34 @@ def main():
     print("Loading LLM...")
     llm = setup_llm()
     
-    # Load PDF
-    documents = load_pdf(pdf_path)
+    if args.index:
+        # Open a shared index; other processes using it share its memory
+        vectorstore = open_index(args.index)
+    else:
+        # Load PDF
+        documents = load_pdf(pdf_path)
+        
+        # Create vector store
+        vectorstore = create_vectorstore(documents)
     
-    # Create vector store
-    vectorstore = create_vectorstore(documents)
+    if args.save_index and isinstance(vectorstore, (ShardedIndex, HotIndex)):
+        print(f"⚠️  --save-index ignored: {args.index} is already saved")
+    elif args.save_index:
+        save_shared_index(vectorstore, args.save_index)
+        print(f"💾 Saved shared index to {args.save_index}")
     
     # Create QA chain
-    qa_chain = create_qa_chain(llm, vectorstore)
+    filters = {key: getattr(args, key) for key in ("source", "pages", "section", "since", "until")
+               if getattr(args, key) is not None}
+    qa_chain = create_qa_chain(llm, vectorstore, filters=filters)
     
-    # Run interactive mode
-    interactive_mode(qa_chain)
+    if args.summarize:
+        summarize_document(llm, vectorstore, args.summary_concurrency)
+    elif args.questions:
+        batch_mode(qa_chain, args.questions)
+    else:
+        # Run interactive mode
+        interactive_mode(qa_chain, llm)
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
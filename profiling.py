@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Pipeline Profiling
+Record a cProfile CPU profile and a tracemalloc allocation snapshot around
+each pipeline stage (load_pdf, create_vectorstore, ask_question, ...).
+
+Each run of a stage writes three files to the profile directory:
+  <stage>-<n>.prof        pstats dump (snakeviz, pstats, gprof2dot)
+  <stage>-<n>.folded      collapsed stacks (flamegraph.pl, speedscope)
+  <stage>-<n>-allocs.txt  peak traced memory and the top-N allocation sites
+"""
+
+import cProfile
+import functools
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+_out_dir = None
+_top_n = 25
+_runs = Counter()
+# Output path prefix of the stage being profiled, or False
+_active = False
+# Profiles recorded by worker threads during the active stage (see in_thread)
+_thread_profiles = []
+_thread_lock = threading.Lock()
+
+
+def enable(out_dir, top_n=25):
+    """Turn profiling on and write results to out_dir."""
+    global _out_dir, _top_n
+    os.makedirs(out_dir, exist_ok=True)
+    _out_dir = out_dir
+    _top_n = top_n
+    print(f"📈 Profiling enabled, writing results to {out_dir}/")
+
+
+def _label(func):
+    filename, line, name = func
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def _write_folded(stats, path):
+    """Write collapsed stacks for flamegraph tools.
+
+    cProfile keeps only caller/callee edges, not full stacks, so each
+    function's own time is attributed to the chain of its heaviest callers.
+    """
+    entries = stats.stats
+    lines = []
+    for func, (_, _, own_time, _, callers) in entries.items():
+        weight = int(own_time * 1_000_000)
+        if weight <= 0:
+            continue
+        stack = [func]
+        seen = {func}
+        while callers:
+            caller = max(callers, key=lambda c: callers[c][3])
+            if caller in seen or caller not in entries:
+                break
+            stack.append(caller)
+            seen.add(caller)
+            callers = entries[caller][4]
+        lines.append(";".join(_label(f).replace(";", ",") for f in reversed(stack)) + f" {weight}")
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _write_allocations(snapshot, peak, elapsed, path):
+    """Write peak memory and the top-N surviving allocation sites."""
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ])
+    top = snapshot.statistics("lineno")[:_top_n]
+    with open(path, "w") as f:
+        f.write(f"Wall time: {elapsed:.3f} s\n")
+        f.write(f"Peak traced memory: {peak / (1024 * 1024):.2f} MB\n\n")
+        f.write(f"Top {len(top)} allocation sites still alive at end of stage:\n")
+        for i, stat in enumerate(top, 1):
+            frame = stat.traceback[0]
+            f.write(f"{i:3}. {frame.filename}:{frame.lineno}: "
+                    f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+
+
+@contextmanager
+def stage(name):
+    """Profile the enclosed block as one run of the named stage.
+
+    Does nothing when profiling is off or another stage is already being
+    profiled (cProfile cannot nest).
+    """
+    global _active
+    if _out_dir is None or _active:
+        yield
+        return
+
+    _runs[name] += 1
+    base = os.path.join(_out_dir, f"{name}-{_runs[name]:03d}")
+    with _thread_lock:
+        _thread_profiles.clear()
+        _active = base
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    start = time.perf_counter()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if not was_tracing:
+            tracemalloc.stop()
+        with _thread_lock:
+            _active = False
+            thread_profiles = list(_thread_profiles)
+            _thread_profiles.clear()
+
+        stats = pstats.Stats(profiler)
+        if thread_profiles:
+            stats.add(*thread_profiles)
+        stats.dump_stats(base + ".prof")
+        _write_folded(stats, base + ".folded")
+        _write_allocations(snapshot, peak, elapsed, base + "-allocs.txt")
+
+
+@contextmanager
+def in_thread():
+    """Profile the enclosed block of a worker thread into the active stage.
+
+    cProfile only sees the thread that enabled it, so work a stage hands to
+    other threads (e.g. streamed LLM requests) must be wrapped in this to
+    show up in the stage's profile. Does nothing when no stage is active;
+    a thread that outlives its stage is not recorded.
+    """
+    with _thread_lock:
+        base = _active
+    if not base:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Python 3.12+: the stage's profiler already covers every thread
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        with _thread_lock:
+            if _active == base:
+                _thread_profiles.append(profiler)
+
+
+def profiled(func):
+    """Decorator that profiles every call of func as a stage of the same name."""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with stage(func.__name__):
+            return func(*args, **kwargs)
+    return wrapper
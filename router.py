@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Model Cascade Routing
+Send queries to a small, fast model by default and escalate to the large
+model when a cheap heuristic says the query needs it, or when the small
+model's answer looks unsure. Every decision is logged.
+"""
+
+from collections import Counter, defaultdict
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger("router")
+
+GREETING = re.compile(r"^\s*(hi|hello|hey|thanks|thank you|good (morning|afternoon|evening)|bye)\b", re.I)
+COMPLEX = re.compile(
+    r"\b(write|code|function|script|implement|debug|explain|why|compare|analy[sz]e|"
+    r"summari[sz]e|translate|prove|derive|step by step|design|plan|essay|story)\b", re.I
+)
+# Hedges only count at the start of a sentence, so "it is unclear whether" or
+# "I cannot stress enough" in the middle of a confident answer doesn't escalate
+UNSURE = re.compile(
+    r"(?:^|[.!?:]\s+|\n\s*)(i'?m not sure|i am not sure|i don'?t know|i do not know|"
+    r"i (?:cannot|can'?t) (?:answer|say|tell|determine|be sure)|i'?m (?:not able|unable) to|"
+    r"(?:there is |there'?s )?not enough information|there isn'?t enough information|"
+    r"i don'?t have enough information|"
+    r"as an ai(?: language model)?, i (?:cannot|can'?t|don'?t))", re.I
+)
+
+
+def log_to(path):
+    """Append routing decisions to a log file."""
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class ModelRouter:
+    """Pick the small or large model per query, escalating when needed."""
+
+    def __init__(self, small_model="phi3", large_model="mistral", max_small_words=15):
+        self.small_model = small_model
+        self.large_model = large_model
+        self.max_small_words = max_small_words
+        self.counts = Counter()
+        self.latency = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def choose(self, query):
+        """Return (model, reason) for a query before anything is generated."""
+        words = len(query.split())
+        if GREETING.match(query) and words <= self.max_small_words:
+            return self.small_model, "greeting"
+        if "```" in query or "\n" in query.strip():
+            return self.large_model, "code or multi-line input"
+        if COMPLEX.search(query):
+            return self.large_model, "complex task keyword"
+        if words > self.max_small_words:
+            return self.large_model, f"long query ({words} words)"
+        return self.small_model, "short query"
+
+    def escalation_reason(self, answer):
+        """Why a small-model answer should be retried on the large model, if at all."""
+        if not answer or not answer.strip():
+            return "empty answer"
+        if UNSURE.search(answer.strip()):
+            return "unsure answer"
+        return None
+
+    def _timed(self, ask, model, query):
+        start = time.perf_counter()
+        try:
+            answer = ask(model, query)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.counts[model] += 1
+                self.latency[model] += elapsed
+        return answer, elapsed
+
+    def route(self, query, ask):
+        """Answer a query through ask(model, query), cascading if needed.
+
+        If the small model raises (not installed, timed out, ...), the query
+        escalates to the large model; errors from the large model propagate.
+        """
+        model, reason = self.choose(query)
+        cascade = model == self.small_model and self.small_model != self.large_model
+        start = time.perf_counter()
+        try:
+            answer, elapsed = self._timed(ask, model, query)
+            escalate = self.escalation_reason(answer) if cascade else None
+        except Exception as e:
+            if not cascade:
+                raise
+            answer, elapsed, escalate = None, time.perf_counter() - start, f"error: {e}"
+        logger.info("model=%s reason=%r words=%d latency=%.2fs", model, reason, len(query.split()), elapsed)
+
+        if escalate:
+            with self._lock:
+                self.counts["escalations"] += 1
+            answer, elapsed = self._timed(ask, self.large_model, query)
+            logger.info("model=%s reason=%r escalated_from=%s latency=%.2fs",
+                        self.large_model, escalate, self.small_model, elapsed)
+        return answer
+
+    def summary(self):
+        """One-line summary of routing and average latency per model."""
+        parts = []
+        for model in dict.fromkeys((self.small_model, self.large_model)):
+            n = self.counts[model]
+            avg = self.latency[model] / n if n else 0.0
+            parts.append(f"{model} {n} calls, avg {avg:.2f}s")
+        return f"🔀 Routing: {'; '.join(parts)}; {self.counts['escalations']} escalated"
@@ -2,12 +2,29 @@
 """
 Setup script for Local LLM Agent
 Helps users get started quickly with the project.
+
+Dependencies and Ollama models are installed concurrently with live
+progress. Models already present are skipped, and an interrupted pull
+resumes where it stopped (Ollama keeps partially downloaded layers).
+Point OLLAMA_HOST at another server, e.g. a local stand-in, to provision
+through it. Uses only the standard library, since it runs before the
+dependencies are installed.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+import urllib.error
+import urllib.request
 import subprocess
+import argparse
+import json
 import sys
 import os
 import platform
+import threading
+import time
+
+MODELS = ["mistral", "phi3", "nomic-embed-text"]
+PULL_RETRIES = 3
 
 def run_command(command, description):
     """Run a command and handle errors."""
@@ -31,8 +48,33 @@ def check_python_version():
     print(f"✅ Python version: {version.major}.{version.minor}.{version.micro}")
     return True
 
+def ollama_url():
+    """Base URL of the Ollama server, from OLLAMA_HOST like the ollama CLI."""
+    host = os.environ.get("OLLAMA_HOST", "127.0.0.1:11434")
+    if "://" not in host:
+        host = "http://" + host
+    return host.rstrip("/")
+
+def ollama_request(path, payload=None, timeout=10):
+    """Open a GET (or POST, with a JSON payload) request to the Ollama API."""
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(ollama_url() + path, data=data,
+                                     headers={"Content-Type": "application/json"})
+    return urllib.request.urlopen(request, timeout=timeout)
+
+def ollama_running():
+    """True if the Ollama server answers."""
+    try:
+        with ollama_request("/api/version", timeout=3):
+            return True
+    except (urllib.error.URLError, OSError):
+        return False
+
 def check_ollama():
     """Check if Ollama is installed and running."""
+    if os.environ.get("OLLAMA_HOST") and ollama_running():
+        print(f"✅ Using Ollama server at {ollama_url()}")
+        return True
     try:
         result = subprocess.run(["ollama", "--version"], capture_output=True, text=True)
         if result.returncode == 0:
@@ -64,30 +106,158 @@ def create_virtual_environment():
     
     return run_command("python3 -m venv venv", "Creating virtual environment")
 
-def install_dependencies():
-    """Install Python dependencies."""
+class Progress:
+    """Live status of concurrent provisioning tasks.
+
+    On a terminal every task shares one redrawn line; when piped, each task
+    logs a plain line every few seconds instead.
+    """
+
+    def __init__(self):
+        self.lines = {}
+        self._lock = threading.Lock()
+        self._last_print = {}
+        self._interactive = sys.stdout.isatty()
+
+    def update(self, task, line, force=False):
+        with self._lock:
+            self.lines[task] = line
+            if self._interactive:
+                status = " | ".join(self.lines.values())
+                sys.stdout.write("\r\033[K" + status[:200])
+                sys.stdout.flush()
+            elif force or time.monotonic() - self._last_print.get(task, 0) > 5:
+                self._last_print[task] = time.monotonic()
+                print(f"   {line}")
+
+    def done(self, task, line):
+        with self._lock:
+            self.lines.pop(task, None)
+            if self._interactive:
+                sys.stdout.write("\r\033[K")
+            print(line)
+            if self._interactive and self.lines:
+                sys.stdout.write(" | ".join(self.lines.values())[:200])
+                sys.stdout.flush()
+
+def install_dependencies(progress=None):
+    """Install Python dependencies, streaming pip's progress."""
     # Determine the correct pip command
     if os.name == 'nt':  # Windows
         pip_cmd = "venv\\Scripts\\pip"
     else:  # Unix/Linux/macOS
         pip_cmd = "venv/bin/pip"
     
-    return run_command(f"{pip_cmd} install -r requirements.txt", "Installing dependencies")
+    progress = progress or Progress()
+    progress.update("pip", "pip starting")
+    process = subprocess.Popen(f"{pip_cmd} install -r requirements.txt", shell=True, text=True,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output = []
+    for line in process.stdout:
+        output.append(line)
+        if line.startswith(("Collecting", "Downloading", "Installing", "Requirement already")):
+            progress.update("pip", "pip " + line.strip()[:60])
+    if process.wait() != 0:
+        progress.done("pip", "❌ Installing dependencies failed:\n" + "".join(output[-20:]))
+        return False
+    progress.done("pip", "✅ Dependencies installed")
+    return True
 
-def download_ollama_models():
-    """Download required Ollama models."""
-    models = ["mistral", "nomic-embed-text"]
-    
+def installed_models():
+    """Map of model name to digest for the models the server already has."""
+    with ollama_request("/api/tags") as response:
+        models = json.load(response).get("models", [])
+    names = {}
     for model in models:
-        print(f"🔄 Downloading Ollama model: {model}")
-        if not run_command(f"ollama pull {model}", f"Downloading {model}"):
-            print(f"⚠️  Warning: Failed to download {model}")
-            print(f"   You can download it manually with: ollama pull {model}")
+        name = model.get("name") or model.get("model")
+        names[name] = model.get("digest", "")
+        if name.endswith(":latest"):
+            names[name[:-len(":latest")]] = model.get("digest", "")
+    return names
+
+def parse_model(spec):
+    """Split 'name' or 'name@digest' into (name, digest or None)."""
+    name, _, digest = spec.partition("@")
+    if digest.startswith("sha256:"):
+        digest = digest[len("sha256:"):]
+    return name, digest or None
+
+def pull_model(spec, installed, progress, retries=PULL_RETRIES):
+    """Pull one model unless it is already present at the wanted digest."""
+    name, digest = parse_model(spec)
+    have = installed.get(name)
+    if have is not None and (digest is None or have.startswith(digest)):
+        progress.done(name, f"✅ {name} already present ({have[:12]})")
+        return True
+
+    for attempt in range(1, retries + 1):
+        try:
+            # Ollama keeps partial layers, so a retry resumes instead of restarting
+            with ollama_request("/api/pull", {"name": name, "stream": True}, timeout=60) as response:
+                for line in response:
+                    event = json.loads(line)
+                    if "error" in event:
+                        raise RuntimeError(event["error"])
+                    status = event.get("status", "")
+                    if event.get("total"):
+                        percent = 100 * event.get("completed", 0) / event["total"]
+                        status = f"{status[:20]} {percent:.0f}% of {event['total'] / 1e9:.2f} GB"
+                    progress.update(name, f"{name} {status}")
+                    if event.get("status") == "success":
+                        break
+                else:
+                    raise ConnectionError("stream ended before the pull finished")
+            new_digest = installed_models().get(name, "")
+            if digest and not new_digest.startswith(digest):
+                progress.done(name, f"⚠️  {name} pulled, but its digest is {new_digest[:12]}, not {digest[:12]}")
+                return False
+            progress.done(name, f"✅ {name} downloaded ({new_digest[:12]})")
+            return True
+        except (urllib.error.URLError, OSError, ValueError, RuntimeError, ConnectionError) as e:
+            if attempt == retries:
+                progress.done(name, f"⚠️  Warning: Failed to download {name}: {e}\n"
+                                    f"   You can download it manually with: ollama pull {name}")
+                return False
+            progress.update(name, f"{name} retrying after error: {e}", force=True)
+            time.sleep(2 ** attempt)
+
+def download_ollama_models(models=MODELS, progress=None):
+    """Download required Ollama models concurrently."""
+    progress = progress or Progress()
+    # One pull per model; a later name@digest overrides an earlier plain name
+    models = list({parse_model(spec)[0]: spec for spec in models}.values())
+    try:
+        installed = installed_models()
+    except (urllib.error.URLError, OSError, ValueError) as e:
+        print(f"⚠️  Warning: Could not reach Ollama at {ollama_url()}: {e}")
+        print("   Start it with 'ollama serve' and run this script again.")
+        return False
+    with ThreadPoolExecutor(max_workers=len(models) or 1) as pool:
+        results = list(pool.map(lambda spec: pull_model(spec, installed, progress), models))
+    return all(results)
+
+def provision(models=MODELS, skip_deps=False):
+    """Install dependencies and pull models at the same time."""
+    progress = Progress()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        deps = pool.submit(lambda: skip_deps or install_dependencies(progress))
+        pulls = pool.submit(download_ollama_models, models, progress)
+        return deps.result(), pulls.result()
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Set up the Local LLM Agent.")
+    parser.add_argument("--models", nargs="*", default=MODELS,
+                        help="models to pull, optionally pinned as name@digest (default: %(default)s)")
+    parser.add_argument("--skip-deps", action="store_true", help="don't create the venv or install requirements")
+    return parser.parse_args()
 
 def main():
     """Main setup function."""
+    args = parse_args()
     print("🚀 Local LLM Agent Setup")
     print("=" * 50)
+    start = time.perf_counter()
     
     # Check Python version
     if not check_python_version():
@@ -99,16 +269,17 @@ def main():
         sys.exit(1)
     
     # Create virtual environment
-    if not create_virtual_environment():
+    if not args.skip_deps and not create_virtual_environment():
         sys.exit(1)
     
-    # Install dependencies
-    if not install_dependencies():
+    # Install dependencies and download Ollama models side by side
+    print(f"\n📥 Installing dependencies and downloading Ollama models: {', '.join(args.models)}")
+    deps_ok, models_ok = provision(args.models, args.skip_deps)
+    print(f"⏱️  Provisioning took {time.perf_counter() - start:.1f}s")
+    if not deps_ok:
         sys.exit(1)
-    
-    # Download Ollama models
-    print("\n📥 Downloading Ollama models...")
-    download_ollama_models()
+    if not models_ok:
+        print("⚠️  Some models are missing; see the warnings above.")
     
     print("\n🎉 Setup completed successfully!")
     print("\n📋 Next steps:")
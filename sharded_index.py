@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Sharded Vector Index
+Split a corpus into N shards by document hash, build each shard in its own
+process, and search them all in parallel from per-shard worker processes.
+Results are merged into one top-k. A shard that misses its timeout is left
+out, so a slow shard degrades the answer instead of stalling it.
+
+Each shard is a shared index directory (see shared_index.py), so workers
+memory-map their shard and any number of front ends can reuse them.
+
+Usage:
+  python sharded_index.py OUT_DIR a.pdf b.pdf ... [--shards N]
+  python pdf_analyzer.py --index OUT_DIR
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.connection import wait
+from typing import Any, Dict, List
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from embed_batcher import OllamaBatchEmbeddings
+from metadata_index import filtered_search
+from page_cache import document_hash
+from shared_index import save_shared_index, open_shared_index
+import multiprocessing
+import argparse
+import heapq
+import itertools
+import json
+import queue
+import os
+import threading
+import time
+
+# faiss and OpenMP don't survive fork() reliably, so always spawn
+_mp = multiprocessing.get_context("spawn")
+
+
+def shard_of(pdf_path, n_shards):
+    """Shard a document belongs to; stable for the same contents."""
+    return int(document_hash(pdf_path)[:16], 16) % n_shards
+
+
+def _build_shard(pdf_paths, shard_dir, embedding, dedup_threshold):
+    """Parse, chunk, embed and save one shard. Runs in a worker process."""
+    from pdf_analyzer import iter_pages, split_into_chunks
+
+    pages = itertools.chain.from_iterable(iter_pages(pdf_path) for pdf_path in pdf_paths)
+    docs = split_into_chunks(pages, dedup_threshold)
+    save_shared_index(FAISS.from_documents(docs, embedding), shard_dir)
+    return len(docs)
+
+
+def build_sharded_index(pdf_paths, directory, n_shards=None, embedding=None, dedup_threshold=0.85):
+    """Build a sharded index, one process per shard; return chunks per shard."""
+    n_shards = n_shards or os.cpu_count() or 1
+    embedding = embedding or OllamaBatchEmbeddings(model="nomic-embed-text")
+    groups = [[] for _ in range(n_shards)]
+    for pdf_path in pdf_paths:
+        groups[shard_of(pdf_path, n_shards)].append(pdf_path)
+
+    shards = [(f"shard_{i:03d}", paths) for i, paths in enumerate(groups) if paths]
+    os.makedirs(directory, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=_mp) as pool:
+        futures = [pool.submit(_build_shard, paths, os.path.join(directory, name), embedding, dedup_threshold)
+                   for name, paths in shards]
+        counts = [future.result() for future in futures]
+
+    with open(os.path.join(directory, "shards.json"), "w") as f:
+        json.dump({"shards": [name for name, _ in shards], "chunks": counts}, f, indent=2)
+    return counts
+
+
+def is_sharded_index(directory):
+    """True if directory holds a sharded index rather than a single one."""
+    return os.path.exists(os.path.join(directory, "shards.json"))
+
+
+def _shard_worker(shard_dir, conn):
+    """Serve filtered searches against one shard until the pipe closes."""
+    vectorstore = open_shared_index(shard_dir, embedding=None)
+    conn.send(("ready", vectorstore.index.ntotal))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        request_id, vector, k, filters = request
+        conn.send((request_id, filtered_search(vectorstore, vectorstore.metadata_index, vector, k, filters)))
+
+
+class ShardedIndex:
+    """Scatter-gather search over shard worker processes."""
+
+    def __init__(self, directory, embedding, timeout=2.0, startup_timeout=60.0):
+        with open(os.path.join(directory, "shards.json")) as f:
+            shard_names = json.load(f)["shards"]
+        with open(os.path.join(directory, shard_names[0], "index.json")) as f:
+            strategy = DistanceStrategy(json.load(f)["distance_strategy"])
+
+        self.shard_dirs = [os.path.join(directory, name) for name in shard_names]
+        self.embedding = embedding
+        self.timeout = timeout
+        self.higher_is_better = strategy in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.DOT_PRODUCT)
+        self._request_ids = itertools.count()
+        self._local = threading.local()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._dead = set()
+        self._conns = []
+        self._processes = []
+        for shard_dir in self.shard_dirs:
+            parent_conn, child_conn = _mp.Pipe()
+            process = _mp.Process(target=_shard_worker, args=(shard_dir, child_conn), daemon=True)
+            process.start()
+            # Only the worker holds the child end now, so its exit shows up here as EOF
+            child_conn.close()
+            self._conns.append(parent_conn)
+            self._processes.append(process)
+        self.failed = set()
+        self.chunks = self._wait_ready(startup_timeout)
+        if len(self.failed) == self.n_shards:
+            self.close()
+            raise RuntimeError(f"No shard in {directory} could be opened")
+        self._send_locks = [threading.Lock() for _ in self._conns]
+        threading.Thread(target=self._receive, name="shard-replies", daemon=True).start()
+
+    @property
+    def n_shards(self):
+        return len(self._conns)
+
+    def _wait_ready(self, startup_timeout):
+        """Wait for every worker to open its shard; return the chunks served.
+
+        Waiting here keeps process start-up out of the first query's timeout.
+        A worker that exits or doesn't report in time is marked failed and
+        left out of every search.
+        """
+        chunks = 0
+        starting = {conn: shard for shard, conn in enumerate(self._conns)}
+        deadline = time.monotonic() + startup_timeout
+        while starting:
+            ready = wait(list(starting), timeout=max(0.0, deadline - time.monotonic()))
+            if not ready:
+                break
+            for conn in ready:
+                shard = starting.pop(conn)
+                try:
+                    chunks += conn.recv()[1]
+                except (EOFError, OSError):
+                    self.failed.add(shard)
+        for shard in starting.values():
+            self.failed.add(shard)
+            self._processes[shard].terminate()
+        for shard in sorted(self.failed):
+            print(f"⚠️  Shard {shard} ({self.shard_dirs[shard]}) failed to start and will be skipped")
+        return chunks
+
+    @property
+    def last_missing(self):
+        """Shards left out of this thread's most recent search."""
+        return getattr(self._local, "missing", [])
+
+    def _receive(self):
+        """Route shard replies to the queue of the query they answer.
+
+        Runs on one background thread, so any number of queries can be in
+        flight at once. A worker that exits is marked dead, and every
+        waiting query is told so instead of waiting for its timeout.
+        """
+        live = {conn: shard for shard, conn in enumerate(self._conns) if shard not in self.failed}
+        while live:
+            for conn in wait(list(live)):
+                shard = live[conn]
+                try:
+                    request_id, hits = conn.recv()
+                except (EOFError, OSError):
+                    del live[conn]
+                    self._dead.add(shard)
+                    with self._pending_lock:
+                        for replies in self._pending.values():
+                            replies.put((shard, None))
+                    continue
+                with self._pending_lock:
+                    replies = self._pending.get(request_id)
+                # Late replies to a query that already timed out are dropped
+                if replies is not None:
+                    replies.put((shard, hits))
+
+    def search(self, query, k=3, filters=None):
+        """Top-k documents across all shards that answered in time.
+
+        Shards that time out, have died or never started are listed in
+        last_missing.
+        """
+        vector = self.embedding.embed_query(query)
+        request_id = next(self._request_ids)
+        replies = queue.Queue()
+        with self._pending_lock:
+            self._pending[request_id] = replies
+        try:
+            sent = set()
+            for shard, conn in enumerate(self._conns):
+                if shard in self.failed or shard in self._dead:
+                    continue
+                try:
+                    with self._send_locks[shard]:
+                        conn.send((request_id, vector, k, filters or {}))
+                    sent.add(shard)
+                except (BrokenPipeError, OSError):
+                    pass
+
+            hits = []
+            answered = set()
+            deadline = time.monotonic() + self.timeout
+            while sent - answered:
+                try:
+                    shard, shard_hits = replies.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if shard_hits is None:
+                    sent.discard(shard)
+                else:
+                    hits.extend(shard_hits)
+                    answered.add(shard)
+        finally:
+            with self._pending_lock:
+                del self._pending[request_id]
+
+        self._local.missing = sorted(set(range(self.n_shards)) - answered)
+        pick = heapq.nlargest if self.higher_is_better else heapq.nsmallest
+        return [doc for doc, _ in pick(k, hits, key=lambda hit: hit[1])]
+
+    def shards(self):
+        """Open every shard in this process (read-only, mmap'd) for whole-corpus work."""
+        return [open_shared_index(shard_dir, self.embedding) for shard_dir in self.shard_dirs]
+
+    def close(self):
+        """Stop the shard workers."""
+        for conn in self._conns:
+            try:
+                conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self._processes:
+            process.join(timeout=1)
+
+
+class ShardedRetriever(BaseRetriever):
+    """Retriever over a ShardedIndex, with the same filters as FilteredRetriever."""
+
+    index: Any
+    k: int = 3
+    filters: Dict[str, Any] = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        docs = self.index.search(query, self.k, self.filters)
+        if self.index.last_missing:
+            print(f"⚠️  Partial results: shard(s) {self.index.last_missing} did not answer (failed or too slow)")
+        return docs
+
+
+def main():
+    """Build a sharded index from PDFs."""
+    parser = argparse.ArgumentParser(description="Build a sharded vector index from PDFs.")
+    parser.add_argument("directory", help="where to write the sharded index")
+    parser.add_argument("pdf_paths", nargs="+", help="PDFs to index")
+    parser.add_argument("--shards", type=int, help="number of shards (default: number of CPU cores)")
+    args = parser.parse_args()
+
+    print(f"🔧 Building sharded index from {len(args.pdf_paths)} PDFs...")
+    start = time.perf_counter()
+    counts = build_sharded_index(args.pdf_paths, args.directory, args.shards)
+    print(f"✅ Indexed {sum(counts)} chunks into {len(counts)} shards in {time.perf_counter() - start:.1f}s")
+    print(f"   Query it with: python pdf_analyzer.py --index {args.directory}")
+
+
+if __name__ == "__main__":
+    main()
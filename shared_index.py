@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Shared Memory-Mapped Vector Index
+Persist a vector store as flat files and open it read-only through mmap,
+so every worker process shares the same physical pages of the FAISS index,
+chunk texts and metadata columns. Opening costs the same at any corpus size
+because nothing is read until a query touches it.
+
+Directory layout:
+  index.json         manifest (row count, dimension, distance settings)
+  index.faiss        FAISS index (memory-mapped)
+  texts.bin(.npy)    chunk texts, utf-8, with an offsets array
+  metadata.bin(.npy) chunk metadata, JSON per row, with an offsets array
+  meta_*.npy         columnar filter index (see metadata_index.py)
+"""
+
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from metadata_index import MetadataIndex
+import numpy as np
+import faiss
+import json
+import mmap
+import os
+
+# IO_FLAG_MMAP_IFC maps flat (IndexFlat*) codes; older faiss only has IO_FLAG_MMAP
+MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+class RecordFile:
+    """Variable-length byte records in one memory-mapped file."""
+
+    def __init__(self, path):
+        self.offsets = np.load(path + ".npy", mmap_mode="r")
+        with open(path, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self._data[int(self.offsets[i]):int(self.offsets[i + 1])]
+
+    @staticmethod
+    def write(path, records):
+        """Write an iterable of bytes records and their offsets array."""
+        offsets = [0]
+        with open(path, "wb") as f:
+            for record in records:
+                f.write(record)
+                offsets.append(offsets[-1] + len(record))
+        np.save(path + ".npy", np.array(offsets, dtype=np.int64))
+
+
+class RowIds:
+    """index_to_docstore_id for a shared index: FAISS row i is docstore id i."""
+
+    def __init__(self, size):
+        self.size = size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, row):
+        if not 0 <= row < self.size:
+            raise KeyError(row)
+        return row
+
+    def get(self, row, default=None):
+        return row if 0 <= row < self.size else default
+
+    def values(self):
+        return range(self.size)
+
+    def items(self):
+        return ((row, row) for row in range(self.size))
+
+
+class MmapDocstore(Docstore):
+    """Read-only docstore that decodes chunks from memory-mapped files."""
+
+    def __init__(self, texts, metadatas):
+        self.texts = texts
+        self.metadatas = metadatas
+
+    def search(self, search):
+        row = int(search)
+        if not 0 <= row < len(self.texts):
+            return f"ID {search} not found."
+        return Document(page_content=self.texts[row].decode("utf-8"),
+                        metadata=json.loads(self.metadatas[row]))
+
+    def delete(self, ids):
+        raise NotImplementedError("Shared indexes are read-only")
+
+
+class SharedFAISS(FAISS):
+    """FAISS store opened from a shared index directory.
+
+    Carries its persisted MetadataIndex so filtered retrieval doesn't have
+    to rebuild it from every chunk.
+    """
+
+    metadata_index = None
+
+    def add_texts(self, *args, **kwargs):
+        raise NotImplementedError("Shared indexes are read-only; rebuild and save a new one")
+
+
+def save_shared_index(vectorstore, directory):
+    """Persist a langchain FAISS store in the shared, mmap-friendly layout."""
+    os.makedirs(directory, exist_ok=True)
+    rows = range(vectorstore.index.ntotal)
+    docs = [vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]) for i in rows]
+
+    faiss.write_index(vectorstore.index, os.path.join(directory, "index.faiss"))
+    RecordFile.write(os.path.join(directory, "texts.bin"), (d.page_content.encode("utf-8") for d in docs))
+    RecordFile.write(os.path.join(directory, "metadata.bin"), (json.dumps(d.metadata).encode("utf-8") for d in docs))
+    MetadataIndex([d.metadata for d in docs]).save(directory)
+
+    with open(os.path.join(directory, "index.json"), "w") as f:
+        json.dump({
+            "count": len(docs),
+            "dimension": vectorstore.index.d,
+            "normalize_L2": vectorstore._normalize_L2,
+            "distance_strategy": vectorstore.distance_strategy.value,
+        }, f, indent=2)
+
+
+def open_shared_index(directory, embedding):
+    """Open a saved index read-only; every process shares its pages."""
+    with open(os.path.join(directory, "index.json")) as f:
+        manifest = json.load(f)
+
+    index = faiss.read_index(os.path.join(directory, "index.faiss"), MMAP_FLAGS)
+    docstore = MmapDocstore(RecordFile(os.path.join(directory, "texts.bin")),
+                            RecordFile(os.path.join(directory, "metadata.bin")))
+    vectorstore = SharedFAISS(
+        embedding,
+        index,
+        docstore,
+        RowIds(manifest["count"]),
+        normalize_L2=manifest["normalize_L2"],
+        distance_strategy=DistanceStrategy(manifest["distance_strategy"]),
+    )
+    vectorstore.metadata_index = MetadataIndex.load(directory)
+    return vectorstore
@@ -4,40 +4,127 @@ Simple Local LLM Chat
 A basic chat interface using Ollama directly via HTTP requests.
 """
 
+from profiling import profiled
+from router import ModelRouter, log_to
+from hedging import Hedger, DeadlineExceeded
+import profiling
+import http.client
+import urllib.parse
 import requests
+import argparse
 import json
+import socket
 import sys
 
-def chat_with_ollama(prompt, model="mistral"):
-    """Send a prompt to Ollama and get a response."""
-    url = "http://localhost:11434/api/generate"
+OLLAMA_URL = "http://localhost:11434"
+
+# Shared across calls so the hedge delay tracks recent first-token latency
+hedger = Hedger()
+
+def _disconnect(connection):
+    """Shut down a connection's socket, waking a read blocked on it."""
+    if connection.sock is not None:
+        try:
+            connection.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+def ollama_attempt(prompt, model, base_url=OLLAMA_URL):
+    """Make a hedger attempt that streams a generation from an Ollama server."""
+    def attempt(cancel):
+        data = {
+            "model": model,
+            "prompt": prompt,
+            "stream": True
+        }
+        # http.client rather than requests: Ollama sends no headers until the
+        # first token, and requests only exposes the socket after the headers
+        url = urllib.parse.urlsplit(base_url)
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=5)
+        connection.connect()
+        connection.sock.settimeout(hedger.deadline)
+        # Drop the connection as soon as this attempt loses or times out, even
+        # while it still waits for its first token; Ollama then aborts the generation
+        stop_watching = cancel.on_set(lambda: _disconnect(connection))
+        try:
+            connection.request("POST", "/api/generate", body=json.dumps(data),
+                               headers={"Content-Type": "application/json"})
+            response = connection.getresponse()
+            if response.status != 200:
+                raise requests.exceptions.HTTPError(f"{response.status} {response.reason} from {base_url}")
+            for line in response:
+                if cancel.is_set():
+                    return
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise requests.exceptions.RequestException(chunk["error"])
+                yield chunk.get("response", "")
+                if chunk.get("done"):
+                    return
+        finally:
+            stop_watching()
+            connection.close()
+    return attempt
+
+@profiled
+def chat_with_ollama(prompt, model="mistral", hedge_model=None, hedge_url=None):
+    """Send a prompt to Ollama and get a response.
     
-    data = {
-        "model": model,
-        "prompt": prompt,
-        "stream": False
-    }
+    Gives up after hedger.deadline seconds. If hedge_model or hedge_url is
+    set, a slow first token triggers a duplicate request to that backup.
+    """
+    backup = None
+    if hedge_model or hedge_url:
+        backup = ollama_attempt(prompt, hedge_model or model, hedge_url or OLLAMA_URL)
     
     try:
-        response = requests.post(url, json=data)
-        response.raise_for_status()
-        result = response.json()
-        return result.get("response", "No response received")
-    except requests.exceptions.RequestException as e:
+        return hedger.run(ollama_attempt(prompt, model), backup) or "No response received"
+    except DeadlineExceeded as e:
+        print(f"⏱️  Gave up: {e}")
+        return None
+    except (OSError, http.client.HTTPException) as e:
+        # Covers requests' exceptions too, which are OSErrors
         print(f"❌ Error connecting to Ollama: {e}")
         return None
     except json.JSONDecodeError as e:
         print(f"❌ Error parsing response: {e}")
         return None
 
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Chat with a local LLM over Ollama's HTTP API.")
+    parser.add_argument("--profile", metavar="DIR", help="write CPU profiles and allocation summaries per stage to DIR")
+    parser.add_argument("--deadline", type=float, default=120.0, help="give up on a response after this many seconds")
+    parser.add_argument("--hedge-model", help="send a duplicate request to this model when the first token is slow")
+    parser.add_argument("--hedge-url", help="send a duplicate request to this Ollama server when the first token is slow")
+    parser.add_argument("--hedge-after", type=float, help="hedge after this many seconds instead of the recent p95")
+    parser.add_argument("--small-model", default="phi3", help="fast model tried first for simple queries")
+    parser.add_argument("--large-model", default="mistral", help="model for complex queries and escalations")
+    parser.add_argument("--no-router", action="store_true", help="send every query to the large model")
+    parser.add_argument("--route-log", default="routing.log", help="file that routing decisions are logged to")
+    return parser.parse_args()
+
 def main():
     """Main chat loop."""
+    args = parse_args()
     print("🤖 Simple Local LLM Chat")
     print("=" * 40)
+    
+    if args.profile:
+        profiling.enable(args.profile)
+    
+    hedger.deadline = args.deadline
+    hedger.hedge_after = args.hedge_after
+    
+    router = ModelRouter(args.large_model if args.no_router else args.small_model, args.large_model)
+    log_to(args.route_log)
+    
     print("Loading LLM...")
     
     # Test connection
-    test_response = chat_with_ollama("Say 'Hello, I am working!'")
+    test_response = chat_with_ollama("Say 'Hello, I am working!'", model=router.large_model)
     if test_response is None:
         print("❌ Could not connect to Ollama. Make sure it's running:")
         print("   ollama serve")
@@ -61,7 +148,10 @@ def main():
                 break
             
             print("\n🤖 Assistant: ", end="", flush=True)
-            response = chat_with_ollama(user_input)
+            response = router.route(
+                user_input,
+                lambda model, prompt: chat_with_ollama(prompt, model, args.hedge_model, args.hedge_url)
+            )
             
             if response:
                 print(response)
@@ -73,6 +163,9 @@ def main():
             break
         except Exception as e:
             print(f"\n❌ Unexpected error: {e}")
+    
+    print(router.summary())
+    print(hedger.summary())
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
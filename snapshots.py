@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Hot Index Rebuilds
+Keep serving queries while the index is rebuilt or updated. Every rebuild
+writes a new, immutable snapshot next to the old ones and then flips a
+CURRENT pointer with one atomic rename. Each query pins the snapshot it
+started on, so it never sees a half-built index, and old snapshots are
+deleted once nothing pins them.
+
+Directory layout:
+  CURRENT       name of the live snapshot, e.g. v000003
+  v000001/ ...  shared index directories (see shared_index.py)
+
+Builds run in a separate process, so parsing PDFs doesn't compete with
+query threads for the GIL. Other processes serving the same root (for
+example every Chainlit worker) pick up a new snapshot on their next query.
+
+Usage:
+  python snapshots.py ROOT a.pdf b.pdf ...          # Publish a full rebuild
+  python snapshots.py ROOT new.pdf --update         # Add or replace documents
+  python pdf_analyzer.py --index ROOT               # Serve it; /reindex rebuilds
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from embed_batcher import OllamaBatchEmbeddings
+from metadata_index import filtered_search
+from shared_index import save_shared_index, open_shared_index
+import multiprocessing
+import argparse
+import itertools
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+CURRENT = "CURRENT"
+VERSION = re.compile(r"^v(\d{6})$")
+
+_mp = multiprocessing.get_context("spawn")
+
+
+def is_snapshot_root(directory):
+    """True if directory holds versioned snapshots rather than a single index."""
+    return os.path.exists(os.path.join(directory, CURRENT))
+
+
+def _build_snapshot(pdf_paths, out_dir, embedding, dedup_threshold, base_dir=None):
+    """Index PDFs into out_dir, on top of base_dir's chunks if given.
+
+    Chunks from a base snapshot whose source is being re-ingested are
+    dropped, so updating a document replaces it. Runs in a worker process.
+    """
+    from pdf_analyzer import iter_pages, split_into_chunks
+
+    pages = itertools.chain.from_iterable(iter_pages(pdf_path) for pdf_path in pdf_paths)
+    docs = split_into_chunks(pages, dedup_threshold)
+
+    pairs, metadatas = [], []
+    if base_dir is not None:
+        base = open_shared_index(base_dir, embedding)
+        replaced = {os.path.abspath(p) for p in pdf_paths}
+        for row in range(base.index.ntotal):
+            doc = base.docstore.search(row)
+            if os.path.abspath(doc.metadata.get("source", "")) in replaced:
+                continue
+            pairs.append((doc.page_content, base.index.reconstruct(row)))
+            metadatas.append(doc.metadata)
+
+    texts = [doc.page_content for doc in docs]
+    pairs.extend(zip(texts, embedding.embed_documents(texts) if texts else []))
+    metadatas.extend(doc.metadata for doc in docs)
+    if not pairs:
+        raise ValueError("Nothing to index: no text found in the given PDFs")
+    save_shared_index(FAISS.from_embeddings(pairs, embedding, metadatas=metadatas), out_dir)
+    return len(pairs)
+
+
+class Snapshot:
+    """One opened snapshot and the number of queries pinned to it."""
+
+    def __init__(self, version, vectorstore):
+        self.version = version
+        self.vectorstore = vectorstore
+        self.refs = 0
+
+
+class HotIndex:
+    """A snapshot root that can be rebuilt while queries keep running."""
+
+    def __init__(self, root, embedding, keep=2, dedup_threshold=0.85):
+        self.root = root
+        self.embedding = embedding
+        self.keep = keep
+        self.dedup_threshold = dedup_threshold
+        self._current = None
+        self._retired = []
+        self._lock = threading.Lock()
+        # One build at a time; each build gets its own process
+        self._builder = ThreadPoolExecutor(max_workers=1, thread_name_prefix="reindex")
+        os.makedirs(root, exist_ok=True)
+        self.refresh()
+
+    @property
+    def version(self):
+        """Name of the snapshot new queries are served from."""
+        return self._current.version if self._current else None
+
+    def versions(self):
+        """Snapshot versions on disk, oldest first."""
+        return sorted(name for name in os.listdir(self.root) if VERSION.match(name))
+
+    def _read_current(self):
+        try:
+            with open(os.path.join(self.root, CURRENT)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """Switch to the published snapshot if it changed; return its version."""
+        version = self._read_current()
+        if version is None or version == self.version:
+            return self.version
+        vectorstore = open_shared_index(os.path.join(self.root, version), self.embedding)
+        with self._lock:
+            if self._current is not None:
+                if self._current.version == version:
+                    return version
+                self._retired.append(self._current)
+            self._current = Snapshot(version, vectorstore)
+        self.collect()
+        return version
+
+    @contextmanager
+    def pin(self):
+        """Yield the current snapshot's vector store, kept alive until exit."""
+        self.refresh()
+        with self._lock:
+            snapshot = self._current
+            if snapshot is None:
+                raise LookupError(f"No snapshot published in {self.root} yet")
+            snapshot.refs += 1
+        try:
+            yield snapshot.vectorstore
+        finally:
+            with self._lock:
+                snapshot.refs -= 1
+            if snapshot is not self._current:
+                self.collect()
+
+    def publish(self, build_dir):
+        """Turn a finished build directory into the next version and switch to it."""
+        while True:
+            versions = self.versions()
+            number = int(VERSION.match(versions[-1]).group(1)) + 1 if versions else 1
+            version = f"v{number:06d}"
+            try:
+                # Fails if another process just took this number; try the next
+                os.rename(build_dir, os.path.join(self.root, version))
+                break
+            except OSError:
+                if not os.path.exists(build_dir):
+                    raise
+        tmp = os.path.join(self.root, f"{CURRENT}.{os.getpid()}.tmp")
+        with open(tmp, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp, os.path.join(self.root, CURRENT))
+        self.refresh()
+        return version
+
+    def _build(self, pdf_paths, incremental):
+        if pdf_paths is None:
+            pdf_paths = self.sources()
+        base_dir = os.path.join(self.root, self.version) if incremental and self.version else None
+        build_dir = os.path.join(self.root, f".build-{uuid.uuid4().hex[:8]}")
+        # Send the plain client across, not the micro-batching wrapper and its threads
+        embedding = getattr(self.embedding, "inner", self.embedding)
+        try:
+            with ProcessPoolExecutor(max_workers=1, mp_context=_mp) as pool:
+                pool.submit(_build_snapshot, list(pdf_paths), build_dir, embedding,
+                            self.dedup_threshold, base_dir).result()
+            return self.publish(build_dir)
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+
+    def rebuild(self, pdf_paths=None):
+        """Rebuild from scratch in the background (default: the indexed sources).
+
+        Returns a Future for the new version; queries keep using the current
+        snapshot until it is published.
+        """
+        return self._builder.submit(self._build, pdf_paths, False)
+
+    def update(self, pdf_paths):
+        """Add or replace documents in the background; returns a Future."""
+        return self._builder.submit(self._build, pdf_paths, True)
+
+    def sources(self):
+        """Source files of the chunks in the current snapshot."""
+        with self.pin() as vectorstore:
+            return [source for source in vectorstore.metadata_index.source_values if source]
+
+    def collect(self):
+        """Close unpinned retired snapshots and delete old versions from disk.
+
+        The newest `keep` versions stay on disk so other processes that are
+        still reading one are not affected.
+        """
+        with self._lock:
+            pinned = {s.version for s in self._retired if s.refs > 0}
+            self._retired = [s for s in self._retired if s.refs > 0]
+            current = self.version
+        versions = self.versions()
+        for version in versions[:-self.keep] if self.keep > 0 else versions:
+            if version != current and version not in pinned:
+                shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
+
+    def close(self):
+        """Wait for any running build to finish."""
+        self._builder.shutdown(wait=True)
+
+
+class HotRetriever(BaseRetriever):
+    """Filtered retrieval that pins one snapshot of a HotIndex per query."""
+
+    index: Any
+    k: int = 3
+    filters: Dict[str, Any] = {}
+
+    def _get_relevant_documents(self, query: str, *, run_manager=None) -> List[Document]:
+        with self.index.pin() as vectorstore:
+            vector = vectorstore._embed_query(query)
+            hits = filtered_search(vectorstore, vectorstore.metadata_index, vector, self.k, self.filters)
+        return [doc for doc, _ in hits]
+
+
+def main():
+    """Publish a new snapshot from PDFs."""
+    parser = argparse.ArgumentParser(description="Publish a new index snapshot from PDFs.")
+    parser.add_argument("root", help="snapshot root directory")
+    parser.add_argument("pdf_paths", nargs="*", help="PDFs to index (default: re-ingest the current sources)")
+    parser.add_argument("--update", action="store_true", help="add or replace these PDFs instead of rebuilding")
+    parser.add_argument("--keep", type=int, default=2, help="snapshot versions to keep on disk")
+    args = parser.parse_args()
+
+    hot = HotIndex(args.root, OllamaBatchEmbeddings(model="nomic-embed-text"), keep=args.keep)
+    if not args.pdf_paths and hot.version is None:
+        parser.error("no PDFs given and no snapshot to rebuild from")
+    print(f"🔧 {'Updating' if args.update else 'Rebuilding'} {args.root} (current: {hot.version or 'none'})...")
+    start = time.perf_counter()
+    future = hot.update(args.pdf_paths) if args.update else hot.rebuild(args.pdf_paths or None)
+    version = future.result()
+    print(f"✅ Published {version} in {time.perf_counter() - start:.1f}s")
+    hot.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Local LLM Agent - Whole-Document Summarization
+Map-reduce summaries for documents far larger than the model's context:
+summarize groups of chunks in parallel, then merge the partial summaries
+level by level until they fit a token budget.
+
+Every summary is cached on disk under the hash of its input. Groups are cut
+at content-defined boundaries (a chunk whose hash hits a modulus), so an
+edit only changes the groups around it, and re-summarizing a lightly
+revised document only re-runs the changed parts.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import os
+import threading
+
+PROMPT_VERSION = 1
+# Expected size of one partial summary when grouping them for the next level
+SUMMARY_TOKENS = 250
+MAP_PROMPT = (
+    "Summarize the following part of a longer document. Keep the key facts, "
+    "numbers, names and conclusions. Do not add anything that is not in the text.\n\n"
+    "{text}\n\nSummary:"
+)
+REDUCE_PROMPT = (
+    "The following are summaries of consecutive parts of one document. Combine "
+    "them into a single coherent summary that keeps the most important facts, "
+    "numbers and conclusions.\n\n{text}\n\nSummary:"
+)
+
+
+def estimate_tokens(text):
+    """Rough token count (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """On-disk cache of summaries keyed by model, prompt and input hash."""
+
+    def __init__(self, directory=".summary_cache"):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)["summary"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, key, summary):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"summary": summary}, f)
+        os.replace(tmp, path)
+
+
+def group_texts(texts, group_tokens, text_tokens):
+    """Split texts into consecutive groups of roughly group_tokens each.
+
+    A group ends after a text whose hash is divisible by the expected number
+    of texts per group, or when adding the next text would exceed the budget.
+    The expected number comes from the fixed text_tokens, not from the texts
+    themselves, so boundaries depend only on each text's own content and
+    inserting or editing one text leaves the other groups as they were.
+    """
+    if not texts:
+        return []
+    modulus = max(1, round(group_tokens / text_tokens))
+    groups, current, size = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and size + tokens > group_tokens:
+            groups.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += tokens
+        if int(_digest(text)[:8], 16) % modulus == 0:
+            groups.append(current)
+            current, size = [], 0
+    if current:
+        groups.append(current)
+    return groups
+
+
+class Summarizer:
+    """Parallel, cached map-reduce summarizer around a chat model."""
+
+    def __init__(self, llm, group_tokens=1500, budget=3000, max_concurrency=4, cache=None,
+                 chunk_chars=500):
+        self.llm = llm
+        self.group_tokens = group_tokens
+        # Chunks come from a fixed-size splitter; most are close to its size
+        self.chunk_tokens = estimate_tokens("x" * chunk_chars)
+        self.budget = budget
+        self.max_concurrency = max_concurrency
+        self.cache = cache if cache is not None else SummaryCache()
+        self.model = getattr(llm, "model", type(llm).__name__)
+        self.calls = 0
+        self.cache_hits = 0
+        self._lock = threading.Lock()
+
+    def _summarize(self, prompt, text):
+        key = _digest(f"{PROMPT_VERSION}\0{self.model}\0{prompt}\0{text}")
+        summary = self.cache.get(key)
+        if summary is not None:
+            with self._lock:
+                self.cache_hits += 1
+            return summary
+        with self._lock:
+            self.calls += 1
+        summary = self.llm.invoke(prompt.format(text=text)).content.strip()
+        self.cache.put(key, summary)
+        return summary
+
+    def _run_level(self, prompt, groups):
+        texts = ["\n\n".join(group) for group in groups]
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            return list(pool.map(lambda text: self._summarize(prompt, text), texts))
+
+    def summarize(self, chunks):
+        """Summarize a document given its chunk texts in reading order."""
+        if not chunks:
+            return ""
+        groups = group_texts(chunks, self.group_tokens, self.chunk_tokens)
+        print(f"🗺️  Summarizing {len(chunks)} chunks in {len(groups)} groups...")
+        summaries = self._run_level(MAP_PROMPT, groups)
+
+        level = 1
+        while len(summaries) > 1 and sum(estimate_tokens(s) for s in summaries) > self.budget:
+            groups = group_texts(summaries, self.group_tokens, SUMMARY_TOKENS)
+            if len(groups) == len(summaries):
+                # Every summary is its own group; pair them up so the level shrinks
+                groups = [summaries[i:i + 2] for i in range(0, len(summaries), 2)]
+            print(f"🔁 Reduce level {level}: {len(summaries)} summaries -> {len(groups)}")
+            summaries = self._run_level(REDUCE_PROMPT, groups)
+            level += 1
+
+        if len(summaries) == 1:
+            return summaries[0]
+        return self._summarize(REDUCE_PROMPT, "\n\n".join(summaries))
+
+
+def document_chunks(*vectorstores):
+    """Chunk texts of one or more vector stores in reading order (source, then page)."""
+    docs = []
+    for vectorstore in vectorstores:
+        ids = vectorstore.index_to_docstore_id
+        docs.extend(vectorstore.docstore.search(ids[i]) for i in range(len(ids)))
+    docs.sort(key=lambda d: (d.metadata.get("source", ""), d.metadata.get("page", 0)))
+    return [d.page_content for d in docs]
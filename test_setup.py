@@ -33,7 +33,7 @@ def test_imports():
         return False
     
     try:
-        from langchain_text_splitters import CharacterTextSplitter
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
         print("✅ langchain_text_splitters imported successfully")
     except ImportError as e:
         print(f"❌ Failed to import langchain_text_splitters: {e}")
@@ -112,6 +112,344 @@ def test_basic_functionality():
         print(f"❌ Basic functionality test failed: {e}")
         return False
 
+def check(ok, description):
+    """Print the outcome of one check and return it."""
+    print(f"{'✅' if ok else '❌'} {description}")
+    return bool(ok)
+
+def test_dedup():
+    """Test near-duplicate detection on tables and boilerplate."""
+    print("\n🧹 Testing near-duplicate detection...")
+    from langchain_core.documents import Document
+    from dedup import collapse_near_duplicates
+    
+    table = "Quarterly revenue by region North {} South {} East {} West {} Total {}"
+    docs = [
+        Document(page_content=table.format(120, 340, 560, 780, 1800), metadata={"source": "a.pdf", "page": 3}),
+        Document(page_content=table.format(910, 220, 430, 650, 2210), metadata={"source": "a.pdf", "page": 9}),
+    ]
+    kept = collapse_near_duplicates(docs)
+    ok = check(len(kept) == 2, "tables that differ only in their figures are kept apart")
+    
+    disclaimer = "This report is confidential and may not be shared outside the company without approval."
+    docs = [Document(page_content=disclaimer, metadata={"source": source, "page": page})
+            for source, page in [("a.pdf", 1), ("a.pdf", 4), ("b.pdf", 2)]]
+    kept = collapse_near_duplicates(docs)
+    ok &= check([(d.metadata["source"], d.metadata["pages"]) for d in kept] == [("a.pdf", [1, 4]), ("b.pdf", [2])],
+                "copies are only collapsed within one file, keeping their own pages")
+    return ok
+
+def test_boilerplate_stripping():
+    """Test that headers and footers of a synthetic corpus end up in one chunk per file."""
+    print("\n📄 Testing header/footer stripping on a synthetic corpus...")
+    import tempfile
+    from create_test_pdf import generate_corpus, BOILERPLATE_HEADER
+    from page_cache import PageCache
+    import pdf_analyzer
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_analyzer.page_cache = PageCache(os.path.join(tmp, "pages.sqlite"))
+        paths = generate_corpus(tmp, num_docs=3, min_pages=5, max_pages=8, seed=1)
+        pages = [page for path in paths for page in pdf_analyzer.read_pdf(path)]
+        docs = pdf_analyzer.split_into_chunks(pages)
+        pdf_analyzer.page_cache = None
+    
+    boilerplate = [d for d in docs if BOILERPLATE_HEADER in d.page_content]
+    ok = check(len(boilerplate) == len(paths), f"one header/footer chunk per file ({len(boilerplate)})")
+    ok &= check(all(len(d.metadata["pages"]) == d.metadata["total_pages"] for d in boilerplate),
+                "each header/footer chunk lists every page of its file")
+    ok &= check(not any("Page " in d.page_content and "prohibited" in d.page_content
+                        for d in docs if d not in boilerplate),
+                "no body chunk still contains the footer")
+    return ok
+
+def test_metadata_filters():
+    """Test section filters from the PDF outline and date validation."""
+    print("\n🔎 Testing metadata filters...")
+    import tempfile
+    from create_test_pdf import generate_corpus
+    from metadata_index import MetadataIndex, parse_filter_spec, describe_filters
+    from page_cache import PageCache
+    import pdf_analyzer
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_analyzer.page_cache = PageCache(os.path.join(tmp, "pages.sqlite"))
+        paths = generate_corpus(tmp, num_docs=2, min_pages=6, max_pages=6, seed=2)
+        pages = [page for path in paths for page in pdf_analyzer.read_pdf(path)]
+        docs = pdf_analyzer.split_into_chunks(pages)
+        pdf_analyzer.page_cache = None
+    
+    index = MetadataIndex([d.metadata for d in docs])
+    part_one = [docs[row] for row in index.select(section="part i")]
+    ok = check(part_one and all(d.metadata["section"].startswith("Part I > ") for d in part_one)
+               and {d.metadata["page"] for d in part_one} == {0, 1, 2},
+               "section=Part I selects the chunks of its subsections, pages 1-3")
+    section = docs[-1].metadata["section"].split(" > ")[-1]
+    rows = index.select(section=section, source=os.path.basename(paths[-1]))
+    ok &= check(len(rows) > 0 and all(docs[row].metadata["section"].endswith(section) for row in rows),
+                f"section={section} selects only that section")
+    filters = parse_filter_spec('section="Part II" source=' + os.path.basename(paths[0]))
+    rows = index.select(**filters)
+    ok &= check(len(rows) > 0 and all(docs[row].metadata["section"].startswith("Part II > ") for row in rows),
+                '/filter section="Part II" takes a quoted multi-word section')
+    ok &= check(parse_filter_spec(describe_filters(filters)) == filters, "active filters print in a form that can be typed back")
+    numbered = MetadataIndex([{"section": "2 Methods > 2.1 Data", "page": 0}])
+    ok &= check(list(numbered.select(section="Methods")) == [0], "section=Methods matches a numbered outline title")
+    try:
+        parse_filter_spec("since=2024-13-01")
+        ok &= check(False, "an invalid date is rejected when the filter is set")
+    except ValueError:
+        ok &= check(True, "an invalid date is rejected when the filter is set")
+    return ok
+
+def test_chunk_sizes():
+    """Test that dense pages without blank lines are still split."""
+    print("\n✂️  Testing chunk sizes...")
+    from langchain_core.documents import Document
+    from pdf_analyzer import split_into_chunks
+    
+    words = [f"word{i}" for i in range(1500)]
+    text = "\n".join(" ".join(words[i:i + 12]) for i in range(0, len(words), 12))
+    docs = split_into_chunks([Document(page_content=text, metadata={"source": "dense.pdf", "page": 0})])
+    longest = max(len(d.page_content) for d in docs)
+    return check(len(text) > 9000 and longest <= 500, f"a {len(text)}-character page splits into chunks of at most 500 ({longest})")
+
+def test_merge_copy():
+    """Test that merging an uploaded PDF's index leaves the old index intact."""
+    print("\n📚 Testing index merges for uploads...")
+    from langchain_community.vectorstores import FAISS
+    from benchmark_ingest import HashEmbeddings
+    from ingestion import merge_copy
+    
+    old = FAISS.from_texts(["first document", "second document"], HashEmbeddings())
+    new = FAISS.from_texts(["uploaded document"], HashEmbeddings())
+    merge_copy(new, old)
+    ok = check(old.index.ntotal == 2 and len(old.docstore._dict) == 2,
+               "the old index still holds its chunks for queries already running on it")
+    texts = sorted(new.docstore.search(new.index_to_docstore_id[i]).page_content for i in range(new.index.ntotal))
+    ok &= check(texts == ["first document", "second document", "uploaded document"],
+                "the new index holds the old chunks and the upload")
+    return ok
+
+def test_summary_groups():
+    """Test that editing one chunk only regroups the chunks around it."""
+    print("\n🗺️  Testing summary grouping...")
+    import tempfile
+    from summarizer import Summarizer, SummaryCache, group_texts
+    
+    chunks = [f"Paragraph {i} about topic {i % 7}. " * (3 + i % 5) for i in range(200)]
+    edited = list(chunks)
+    edited[100] = "A much longer rewritten paragraph. " * 30
+    before, after = group_texts(chunks, 1500, 126), group_texts(edited, 1500, 126)
+    changed = [g for g in after if g not in before]
+    ok = check(len(changed) <= 2 and any(edited[100] in g for g in changed),
+               f"one edit changes only the groups around it ({len(changed)} of {len(after)})")
+    
+    class FakeLLM:
+        model = "fake"
+        def invoke(self, prompt):
+            return type("Reply", (), {"content": f"summary of {len(prompt)} characters"})()
+    with tempfile.TemporaryDirectory() as tmp:
+        summarizer = Summarizer(FakeLLM(), max_concurrency=8, cache=SummaryCache(tmp))
+        summarizer.summarize(chunks)
+        calls = summarizer.calls
+        summarizer.summarize(edited)
+    ok &= check(summarizer.calls - calls <= len(changed) + 1,
+                f"re-summarizing the edited document re-runs only the changed groups ({summarizer.calls - calls})")
+    return ok
+
+def test_session_uploads():
+    """Test that a session's uploads are searched next to the shared index, not copied into it."""
+    print("\n📎 Testing session uploads...")
+    import tempfile
+    from langchain_community.vectorstores import FAISS
+    from benchmark_ingest import HashEmbeddings
+    from metadata_index import MetadataIndex, SessionRetriever
+    from shared_index import save_shared_index, open_shared_index
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus = FAISS.from_texts([f"shared report about topic {i}" for i in range(50)], HashEmbeddings(),
+                                  metadatas=[{"source": "shared.pdf", "page": i} for i in range(50)])
+        save_shared_index(corpus, os.path.join(tmp, "index"))
+        shared = open_shared_index(os.path.join(tmp, "index"), HashEmbeddings())
+        uploads = FAISS.from_texts(["uploaded invoice from the plumbing company"], HashEmbeddings(),
+                                   metadatas=[{"source": "invoice.pdf", "page": 0}])
+        retriever = SessionRetriever(base=shared, uploads=uploads,
+                                     uploads_index=MetadataIndex.from_vectorstore(uploads))
+        docs = retriever.invoke("plumbing invoice")
+        ok = check(docs[0].metadata["source"] == "invoice.pdf", "an uploaded chunk can be the top hit")
+        docs = retriever.invoke("shared report topic 7")
+        ok &= check(len(docs) == 3 and any(d.metadata["source"] == "shared.pdf" for d in docs),
+                    "shared chunks still come back, merged by distance")
+        ok &= check(uploads.index.ntotal == 1, "the shared index is not copied into the session's store")
+    return ok
+
+def test_router():
+    """Test that small-model failures escalate to the large model."""
+    print("\n🔀 Testing model routing...")
+    from router import ModelRouter
+    
+    router = ModelRouter("small", "large")
+    def ask(model, question):
+        if model == "small":
+            raise ConnectionError("model 'small' not found")
+        return f"{model} answer"
+    ok = check(router.route("What is the capital of France?", ask) == "large answer",
+               "an error from the small model escalates to the large model")
+    ok &= check(router.counts["escalations"] == 1, "the escalation is counted")
+    ok &= check(router.escalation_reason("I'm not sure, but it might be Paris.") == "unsure answer",
+                "a hedged answer escalates")
+    ok &= check(router.escalation_reason("Paris. I cannot stress enough how old it is; "
+                                         "its founding date is unclear.") is None,
+                "a confident answer mentioning 'unclear' or 'I cannot' does not escalate")
+    try:
+        router.route("Explain how transformers work", ask)
+        ok &= check(True, "large-model queries don't touch the small model")
+    except Exception as e:
+        ok &= check(False, f"large-model query failed: {e}")
+    return ok
+
+def test_model_provisioning():
+    """Test model skip, resume and digest checks in setup.py against a stand-in server."""
+    print("\n📥 Testing model provisioning...")
+    from fake_ollama import FakeOllama
+    import setup
+    
+    old_host = os.environ.get("OLLAMA_HOST")
+    with FakeOllama(models={"phi3:latest": "aaa111"}) as fake:
+        os.environ["OLLAMA_HOST"] = fake.host
+        fake.interrupt_pulls.add("mistral")
+        fake.pull_digests["pinned"] = "ccc333"
+        try:
+            all_ok = setup.download_ollama_models(["phi3", "mistral", "pinned@sha256:ddd444"])
+        finally:
+            if old_host is None:
+                os.environ.pop("OLLAMA_HOST", None)
+            else:
+                os.environ["OLLAMA_HOST"] = old_host
+    
+    ok = check(not any(name == "phi3" for name, _ in fake.pulls), "a model already present is not pulled again")
+    mistral = [done for name, done in fake.pulls if name == "mistral"]
+    ok &= check(len(mistral) == 2 and mistral[1] > 0 and "mistral:latest" in fake.models,
+                f"an interrupted pull is retried and resumes ({mistral})")
+    ok &= check(not all_ok and fake.models.get("pinned:latest") == "ccc333",
+                "a pulled model whose digest doesn't match the pin is reported")
+    return ok
+
+def test_hedger():
+    """Test deadlines, hedging and cancellation against a stand-in server."""
+    print("\n🛡️  Testing hedged requests...")
+    import time
+    from fake_ollama import FakeOllama
+    from hedging import Hedger, DeadlineExceeded
+    import simple_chat
+    
+    with FakeOllama() as fake:
+        fake.delays = {"slow": 2.0, "fast": 0.0}
+        simple_chat.hedger = hedger = Hedger(deadline=5, hedge_after=0.2)
+        start = time.monotonic()
+        answer = hedger.run(simple_chat.ollama_attempt("hi", "slow", fake.url),
+                            simple_chat.ollama_attempt("hi", "fast", fake.url))
+        elapsed = time.monotonic() - start
+        ok = check(answer == "Hello from fast." and elapsed < 1.5,
+                   f"a slow first token is hedged and the backup wins ({elapsed:.2f}s)")
+        ok &= check(hedger.stats["hedged"] == 1 and hedger.stats["backup_won"] == 1, "hedging is counted")
+        
+        simple_chat.hedger = hedger = Hedger(deadline=0.5)
+        try:
+            hedger.run(simple_chat.ollama_attempt("hi", "slow", fake.url))
+            ok &= check(False, "a request past its deadline raises DeadlineExceeded")
+        except DeadlineExceeded:
+            ok &= check(True, "a request past its deadline raises DeadlineExceeded")
+        time.sleep(2.0)
+        simple_chat.hedger = Hedger()
+    ok &= check(fake.generations.count(("slow", "client gone")) == 2,
+                "the losing and the timed-out requests are disconnected before their first token")
+    return ok
+
+def test_micro_batcher():
+    """Test that concurrent query embeddings are coalesced into batches."""
+    print("\n📦 Testing embedding micro-batching...")
+    from concurrent.futures import ThreadPoolExecutor
+    from fake_ollama import FakeOllama, fake_vector
+    from embed_batcher import OllamaBatchEmbeddings, MicroBatchingEmbeddings
+    
+    with FakeOllama() as fake:
+        embeddings = MicroBatchingEmbeddings(OllamaBatchEmbeddings(base_url=fake.url), max_wait_ms=20)
+        queries = [f"question {i}" for i in range(32)]
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            vectors = list(pool.map(embeddings.embed_query, queries))
+    ok = check(vectors == [fake_vector(f"query: {q}") for q in queries], "every caller gets its own vector")
+    ok &= check(len(fake.embed_requests) < len(queries),
+                f"{len(queries)} concurrent queries took {len(fake.embed_requests)} requests")
+    
+    class ShortReply:
+        def embed_queries(self, texts):
+            return [[0.0]] * (len(texts) - 1)
+    embeddings = MicroBatchingEmbeddings(ShortReply(), max_wait_ms=20)
+    def outcome(query):
+        try:
+            embeddings.embed_query(query)
+            return "vector"
+        except ValueError:
+            return "error"
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        outcomes = list(pool.map(outcome, queries[:4]))
+    ok &= check(outcomes == ["error"] * 4, "a reply with too few vectors fails every caller instead of hanging")
+    return ok
+
+def test_sharded_index():
+    """Test sharded search, including a shard that dies."""
+    print("\n🧩 Testing the sharded index...")
+    import tempfile
+    from benchmark_ingest import HashEmbeddings
+    from create_test_pdf import generate_corpus
+    from sharded_index import build_sharded_index, ShardedIndex, ShardedRetriever
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = generate_corpus(os.path.join(tmp, "pdfs"), num_docs=4, min_pages=3, max_pages=4, seed=3)
+        build_sharded_index(paths, os.path.join(tmp, "shards"), 2, HashEmbeddings())
+        index = ShardedIndex(os.path.join(tmp, "shards"), HashEmbeddings(), timeout=10)
+        try:
+            retriever = ShardedRetriever(index=index, k=3)
+            docs = retriever.invoke("transformer accuracy")
+            ok = check(len(docs) == 3 and not index.last_missing, "a query gets results from every shard")
+            index._processes[1].kill()
+            index._processes[1].join()
+            docs = retriever.invoke("transformer accuracy")
+            ok &= check(len(docs) > 0 and index.last_missing == [1],
+                        f"a dead shard is reported and the rest still answer ({index.last_missing})")
+        finally:
+            index.close()
+    return ok
+
+def test_snapshots():
+    """Test that a pinned snapshot survives a rebuild."""
+    print("\n🔁 Testing hot index rebuilds...")
+    import tempfile
+    from benchmark_ingest import HashEmbeddings
+    from create_test_pdf import generate_corpus
+    from snapshots import HotIndex
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = generate_corpus(os.path.join(tmp, "pdfs"), num_docs=3, min_pages=3, max_pages=3, seed=4)
+        hot = HotIndex(os.path.join(tmp, "root"), HashEmbeddings(), keep=1)
+        try:
+            first = hot.rebuild(paths[:2]).result()
+            with hot.pin() as old:
+                chunks = old.index.ntotal
+                second = hot.update(paths[2:]).result()
+                ok = check(hot.version == second != first, f"an update publishes a new version ({first} -> {second})")
+                ok &= check(old.index.ntotal == chunks and first in hot.versions(),
+                            "a query pinned to the old version keeps it on disk and intact")
+            with hot.pin() as new:
+                ok &= check(new.index.ntotal > chunks, "new queries see the added document")
+            hot.collect()
+            ok &= check(hot.versions() == [second], "the old version is deleted once unpinned")
+        finally:
+            hot.close()
+    return ok
+
 def test_file_structure():
     """Test if all required files exist."""
     print("\n📁 Testing file structure...")
@@ -147,6 +485,19 @@ def main():
     tests = [
         ("File Structure", test_file_structure),
         ("Package Imports", test_imports),
+        ("Near-Duplicate Detection", test_dedup),
+        ("Header/Footer Stripping", test_boilerplate_stripping),
+        ("Chunk Sizes", test_chunk_sizes),
+        ("Upload Index Merges", test_merge_copy),
+        ("Metadata Filters", test_metadata_filters),
+        ("Summary Grouping", test_summary_groups),
+        ("Session Uploads", test_session_uploads),
+        ("Model Routing", test_router),
+        ("Model Provisioning", test_model_provisioning),
+        ("Hedged Requests", test_hedger),
+        ("Embedding Micro-Batching", test_micro_batcher),
+        ("Sharded Index", test_sharded_index),
+        ("Hot Index Rebuilds", test_snapshots),
         ("Ollama Connection", test_ollama_connection),
         ("Basic Functionality", test_basic_functionality)
     ]